@@ -0,0 +1,347 @@
+import os
+import json
+import tempfile
+import streamlit as st
+import pandas as pd
+from datetime import datetime, date
+
+import instrumentation
+from archive import is_archived
+from cache import cache
+from db import attendance_collection
+from employees import get_employee_names, get_employees, register_employees, set_employee_active
+from export import EXPORT_FORMATS, export_attendance
+from geofence import get_geofences, get_location_restriction, set_geofences, set_location_restriction
+from instrumentation import timed
+from photo_store import PHOTO_FIELDS, load_photo, photo_error_field, photo_failures
+from punch_queue import MAX_WRITE_ATTEMPTS, get_punch_queue
+from query import RECORD_FIELDS, get_attendance_date_range, load_attendance
+from rollups import refresh_rollups, rollup_attendance_stats
+from stats import view_attendance
+from times import format_time, format_time_columns, parse_clock_time
+
+# Admin pages: statistics, record updates, charts and settings, behind the admin login
+
+ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+# Largest export offered as a browser download, bigger ones go through export.py
+MAX_DOWNLOAD_MB = int(os.getenv("EXPORT_MAX_DOWNLOAD_MB", "100"))
+
+def authenticate(username, password):
+    return username == ADMIN_USERNAME and password == ADMIN_PASSWORD
+
+def calculate_hours_present(arrival_time, leaving_time):
+    # Calculate difference in hours
+    difference = (leaving_time - arrival_time).total_seconds() / 3600
+
+    # Round to two decimal places
+    return round(difference, 2)
+
+def parse_punch_times(arrival_text, leaving_text, day):
+    try:
+        # Parse arrival and leaving times in 12-hour format with AM/PM, on the record's day
+        arrival_time = parse_clock_time(arrival_text, day)
+        leaving_time = parse_clock_time(leaving_text, day, after=arrival_time)
+        return arrival_time, leaving_time
+
+    except ValueError as e:
+        print(f"Error parsing time: {e}")
+        return None, None
+
+def update_attendance_page():
+    st.title('Update Attendance Records')
+
+    employees = get_employee_names(active_only=False)
+    selected_employee = st.selectbox('Select Employee to Update', employees)
+
+    selected_date = st.date_input('Select Date', date.today())
+    query_date = datetime.combine(selected_date, datetime.min.time())
+
+    # Fetch attendance record for selected employee and date
+    entry = attendance_collection.find_one({"Name": selected_employee, "Date": query_date})
+
+    if entry:
+        # Photos are only pulled from the photo store when asked for
+        if st.checkbox('Show Photos'):
+            col1, col2 = st.columns(2)
+            for col, field in zip((col1, col2), PHOTO_FIELDS):
+                photo = load_photo(entry.get(field))
+                if photo:
+                    col.image(photo, caption=field)
+                elif entry.get(photo_error_field(field)):
+                    col.warning(f"The {field.lower()} could not be stored: {entry[photo_error_field(field)]}")
+                else:
+                    col.info(f"No {field.lower()} available.")
+
+        st.subheader('Update Details:')
+        new_arrival_time = st.text_input('Arrival Time', value=format_time(entry['Arrival Time']) or '')
+        new_leaving_time = st.text_input('Leaving Time', value=format_time(entry['Leaving Time']) or '')
+
+        if st.button('Update'):
+            arrival_time, leaving_time = parse_punch_times(new_arrival_time, new_leaving_time, selected_date)
+
+            if arrival_time is not None:
+                # Calculate new hours present
+                hours_present = calculate_hours_present(arrival_time, leaving_time)
+
+                # Update MongoDB record with Hours Present
+                result = attendance_collection.update_one(
+                    {"_id": entry["_id"]},
+                    {
+                        "$set": {
+                            'Arrival Time': arrival_time,
+                            'Leaving Time': leaving_time,
+                            'Hours Present': hours_present
+                        },
+                        "$currentDate": {'Updated At': True}
+                    }
+                )
+                if result.modified_count > 0:
+                    refresh_rollups(selected_employee, query_date)
+                    cache.invalidate('attendance')
+                    st.success('Attendance record updated successfully.')
+                else:
+                    st.warning('Failed to update attendance record.')
+            else:
+                st.error('Error calculating hours present. Please check your time inputs.')
+
+    elif is_archived(query_date):
+        st.info('This month has been moved to the attendance archive, its records can no longer be edited.')
+    else:
+        st.warning('No record found for the selected employee and date.')
+
+@timed('plotly_chart', 'plot')
+def plot_chart(fig):
+    st.plotly_chart(fig)
+
+def visualize_attendance():
+    st.title('Visualize Attendance Records')
+
+    min_date, max_date = get_attendance_date_range()
+    if min_date is None:
+        st.warning("No attendance records found.")
+        return
+
+    # Date range selection
+    col1, col2 = st.columns(2)
+    start_date = pd.to_datetime(col1.date_input("Start Date", min_value=min_date, max_value=max_date, value=min_date))
+    end_date = pd.to_datetime(col2.date_input("End Date", min_value=min_date, max_value=max_date, value=max_date))
+    
+    # Employee selection
+    employees = ['All'] + get_employee_names(active_only=False)
+    selected_employee = st.selectbox('Select Employee', employees)
+    
+    # Plotly is only loaded when charts are actually drawn
+    from charts import attendance_figures
+
+    # Bucketed aggregates computed in MongoDB, one point per day or week rather than per record
+    figures = attendance_figures(start_date, end_date, selected_employee)
+
+    if not figures:
+        st.warning("No data available for the selected filters.")
+        return
+
+    for title, fig in figures:
+        st.subheader(title)
+        plot_chart(fig)
+
+def export_records(start_date, end_date, employee, attributes):
+    export_format = st.selectbox('Export Format', ['CSV', 'Parquet'])
+
+    if st.button('Export Records'):
+        mime, extension = EXPORT_FORMATS[export_format.lower()]
+        file_name = f"attendance_records.{extension}"
+        # Written chunk by chunk into a temporary file. The download button then reads the whole
+        # file into this session's memory, so it is only offered up to MAX_DOWNLOAD_MB.
+        with tempfile.TemporaryDirectory() as export_dir:
+            export_path = os.path.join(export_dir, file_name)
+            with open(export_path, 'wb') as export_file:
+                rows = export_attendance(export_file, export_format.lower(), start_date, end_date, employee, attributes)
+            size = os.path.getsize(export_path)
+            if size > MAX_DOWNLOAD_MB * 1024 * 1024:
+                command = [
+                    'python export.py', f'--format {extension}', f'--start {start_date:%Y-%m-%d}', f'--end {end_date:%Y-%m-%d}',
+                    f'--employee "{employee}"', '--attributes ' + ' '.join(f'"{attribute}"' for attribute in attributes), f'--output {file_name}'
+                ]
+                st.warning(f"{rows} records ({size / 1024 / 1024:.0f} MB) are too many to download here. Narrow the range, or export them with:")
+                st.code(' '.join(command), language='bash')
+                return
+            with open(export_path, 'rb') as export_file:
+                st.download_button(
+                    label=f"Download {export_format}",
+                    data=export_file,
+                    file_name=file_name,
+                    mime=mime
+                )
+
+def manage_employees_page():
+    st.title('Manage Employees')
+
+    directory = pd.DataFrame(get_employees(), columns=['Name', 'Active'])
+    directory['Active'] = directory['Active'].fillna(True).astype(bool)
+    edited = st.data_editor(directory, disabled=['Name'], hide_index=True)
+
+    if st.button('Save Changes'):
+        changed = edited[edited['Active'] != directory['Active']]
+        for name, active in zip(changed['Name'], changed['Active']):
+            set_employee_active(name, bool(active))
+        st.success(f"{len(changed)} employees updated.")
+
+    new_name = st.text_input('New Employee').strip()
+    if st.button('Add Employee') and new_name:
+        if register_employees([new_name]):
+            st.success(f"{new_name} added.")
+        else:
+            st.warning(f"{new_name} is already in the directory.")
+
+def performance_page():
+    st.title('Performance')
+    if not instrumentation.ENABLED:
+        st.info("Instrumentation is off. Start the app with PERF_INSTRUMENTATION=1 to record timings.")
+        return
+
+    reruns = instrumentation.recent_reruns()
+    if not reruns:
+        st.warning("No reruns recorded yet.")
+        return
+
+    st.subheader('Recent Reruns')
+    st.dataframe(pd.DataFrame([rerun.summary() for rerun in reversed(reruns)]), hide_index=True)
+
+    labels = [f"{rerun.started_at.strftime('%H:%M:%S')} {rerun.label}" for rerun in reversed(reruns)]
+    selected = st.selectbox('Rerun', range(len(labels)), format_func=lambda i: labels[i])
+    st.dataframe(pd.DataFrame(list(reversed(reruns))[selected].spans), hide_index=True)
+
+    st.subheader('Totals Since Start')
+    st.dataframe(pd.DataFrame(instrumentation.totals()), hide_index=True)
+
+    col1, col2 = st.columns(2)
+    col1.download_button("Download Prometheus metrics", instrumentation.prometheus_text(), file_name="attendance_metrics.prom", mime="text/plain")
+    col2.download_button("Download spans (JSON lines)", instrumentation.json_lines(), file_name="attendance_spans.jsonl", mime="application/x-ndjson")
+
+def attendance_stats_page():
+    st.title('Attendance Statistics')
+    
+    # Authentication
+    if 'authenticated' not in st.session_state:
+        st.session_state.authenticated = False
+
+    if not st.session_state.authenticated:
+        st.sidebar.subheader("Admin Login")
+        username = st.sidebar.text_input("Username")
+        password = st.sidebar.text_input("Password", type="password")
+        if st.sidebar.button("Login"):
+            if authenticate(username, password):
+                st.session_state.authenticated = True
+                st.rerun
+            else:
+                st.sidebar.error("Invalid username or password")
+        return
+
+    # Logout button
+    if st.sidebar.button("Logout"):
+        st.session_state.authenticated = False
+        st.rerun()
+
+    with st.sidebar.expander("Cache Statistics"):
+        st.dataframe(pd.DataFrame(cache.stats()), hide_index=True)
+
+    failures = photo_failures()
+    if failures['count']:
+        # Photos taken through this app process; the kiosk API keeps its own count
+        st.sidebar.warning(f"{failures['count']} photos could not be stored, last error: {failures['last_error']}")
+
+    punch_queue = get_punch_queue()
+    if punch_queue is not None:
+        with st.sidebar.expander("Punch Queue"):
+            status = punch_queue.status()
+            st.metric("Queued punches", status['Queued'], help=f"Oldest waiting {status['Lag (s)']}s")
+            st.dataframe(pd.DataFrame([status]), hide_index=True)
+            if status['Failed']:
+                st.warning(f"{status['Failed']} punches were refused by MongoDB {MAX_WRITE_ATTEMPTS} times and are no longer retried:")
+                st.dataframe(pd.DataFrame(punch_queue.failed_punches()), hide_index=True)
+    
+    # Admin actions
+    admin_action = st.selectbox('Select Action', ['View Attendance', 'Update Records', 'Visualize Attendance', 'Manage Location Restriction', 'Manage Employees', 'Performance'])
+    
+    if admin_action == 'View Attendance':
+        min_date, max_date = get_attendance_date_range()
+        if min_date is None:
+            st.warning("No attendance records found.")
+            return
+        
+        # Date range selection
+        col1, col2 = st.columns(2)
+        start_date = pd.to_datetime(col1.date_input("Start Date", min_value=min_date, max_value=max_date, value=min_date))
+        end_date = pd.to_datetime(col2.date_input("End Date", min_value=min_date, max_value=max_date, value=max_date))
+        
+        # Employee selection
+        employees = ['All'] + get_employee_names(active_only=False)
+        selected_employee = st.selectbox('Select Employee', employees)
+        
+        if selected_employee == 'All':
+            stats_df = rollup_attendance_stats(selected_employee, get_employee_names())
+            st.dataframe(stats_df)
+
+            # Export as CSV
+            if st.button('Export as CSV'):
+                csv = stats_df.to_csv(index=False)
+                st.download_button(
+                    label="Download CSV",
+                    data=csv,
+                    file_name="attendance_stats.csv",
+                    mime="text/csv"
+                )
+
+            export_records(start_date, end_date, selected_employee, RECORD_FIELDS)
+        else:
+            # Attribute selection
+            available_attributes = ['Hours Present', 'Arrival Time', 'Leaving Time', 'Days Present']
+            selected_attributes = st.multiselect('Select Attributes', available_attributes, default=['Hours Present'])
+            
+            if not selected_attributes:
+                st.error('Please select at least one attribute.')
+                return
+            
+            # 'Days Present' is derived, everything else is fetched as-is
+            fields = [attribute for attribute in selected_attributes if attribute in RECORD_FIELDS]
+            
+            # View attendance
+            if st.button('View Attendance'):
+                df = load_attendance(start_date, end_date, selected_employee, fields)
+                result_df = view_attendance(df, start_date, end_date, selected_employee, selected_attributes)
+                st.dataframe(format_time_columns(result_df))
+                
+            export_records(start_date, end_date, selected_employee, selected_attributes)
+    
+    elif admin_action == 'Update Records':
+        update_attendance_page()
+    
+    elif admin_action == 'Visualize Attendance':
+        visualize_attendance()
+
+    elif admin_action == 'Manage Employees':
+        manage_employees_page()
+
+    elif admin_action == 'Performance':
+        performance_page()
+
+    elif admin_action == 'Manage Location Restriction':
+        st.title("Manage Location Restriction")
+        location_restriction = st.checkbox("Enable Location Restriction", value=get_location_restriction())
+
+        if st.button("Update Restriction"):
+            set_location_restriction(location_restriction)
+            st.success(f"Location restriction {'enabled' if location_restriction else 'disabled'} successfully.")
+
+        st.subheader("Allowed Locations")
+        st.caption('Circles: {"name", "type": "circle", "center": [lat, lon], "radius_km"}. Polygons: {"name", "type": "polygon", "points": [[lat, lon], ...]}.')
+        geofences_text = st.text_area("Geofences (JSON)", value=json.dumps(get_geofences(), indent=2), height=250)
+
+        if st.button("Update Locations"):
+            try:
+                set_geofences(json.loads(geofences_text))
+                st.success("Allowed locations updated successfully.")
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError too
+                st.error(f"Invalid geofence configuration: {e}")
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import binascii
+import os
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional
+from fastapi import BackgroundTasks, FastAPI, HTTPException
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+
+from db import ensure_indexes, get_async_db
+from employees import is_active_employee
+from geofence import get_location_restriction, match_allowed_location
+from photo_store import check_photo
+from punch import (
+    ARRIVAL_EXISTS, ARRIVAL_LOGGED, ARRIVAL_MISSING, LEAVING_EXISTS, LEAVING_LOGGED,
+    after_punch, arrival_update, attach_record_photo, get_current_ist_time, leaving_update, record_date
+)
+
+# Headless punch service for badge kiosks, run next to the Streamlit app:
+#   uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+# The record itself is written with the async client on the event loop. Settings lookups,
+# photo encoding and the rollup refresh use the blocking helpers and run on worker threads,
+# the last two after the response has been sent.
+
+MAX_PHOTO_BYTES = int(os.getenv("API_MAX_PHOTO_BYTES", str(5 * 1024 * 1024)))
+
+class Punch(BaseModel):
+    name: str
+    photo: str  # Base64 encoded camera frame (JPEG, PNG or WebP)
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def location(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
+
+class PunchResult(BaseModel):
+    message: str
+    site: Optional[str] = None
+
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(ensure_indexes)
+    yield
+
+app = FastAPI(title='Attendance punch API', lifespan=lifespan)
+
+def attendance():
+    return get_async_db()["attendance"]
+
+def decode_photo(punch):
+    try:
+        data = base64.b64decode(punch.photo, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail="Photo is not valid base64.")
+    if not data:
+        raise HTTPException(status_code=422, detail="A photo is required for attendance verification.")
+    if len(data) > MAX_PHOTO_BYTES:
+        raise HTTPException(status_code=413, detail="Photo is too large.")
+    return data
+
+async def validate_photo(punch):
+    # Refused here, before the punch is written, rather than lost in the photo worker later
+    data = decode_photo(punch)
+    try:
+        await asyncio.to_thread(check_photo, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return data
+
+def punch_site(location):
+    # Same rules as attendance_logging_page; None means no restriction is in force
+    if not get_location_restriction():
+        return None
+    if location is None:
+        raise HTTPException(status_code=400, detail="Location is required.")
+    site = match_allowed_location(*location)
+    if site is None:
+        raise HTTPException(status_code=403, detail="You are not within the allowed location to log your attendance.")
+    return site
+
+async def check_employee(name):
+    if not await asyncio.to_thread(is_active_employee, name):
+        raise HTTPException(status_code=404, detail="Unknown or inactive employee.")
+
+def schedule_followups(background_tasks, name, query_date, field, photo):
+    background_tasks.add_task(attach_record_photo, name, query_date, field, photo)
+    background_tasks.add_task(after_punch, name, query_date)
+
+@app.get('/health')
+async def health():
+    await get_async_db().command('ping')
+    return {'status': 'ok'}
+
+@app.post('/arrival', response_model=PunchResult)
+async def arrival(punch: Punch, background_tasks: BackgroundTasks):
+    photo = await validate_photo(punch)
+    await check_employee(punch.name)
+    location = punch.location()
+    site = await asyncio.to_thread(punch_site, location)
+    query_date = record_date(date.today())
+
+    # A single upsert: the unique (Name, Date) index makes double submissions a no-op
+    try:
+        result = await attendance().update_one(
+            {"Name": punch.name, "Date": query_date},
+            arrival_update(get_current_ist_time(), location),
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=ARRIVAL_EXISTS)
+    if result.upserted_id is None:
+        raise HTTPException(status_code=409, detail=ARRIVAL_EXISTS)
+
+    schedule_followups(background_tasks, punch.name, query_date, 'Arrival Photo', photo)
+    return PunchResult(message=ARRIVAL_LOGGED, site=site)
+
+@app.post('/leaving', response_model=PunchResult)
+async def leaving(punch: Punch, background_tasks: BackgroundTasks):
+    photo = await validate_photo(punch)
+    await check_employee(punch.name)
+    location = punch.location()
+    site = await asyncio.to_thread(punch_site, location)
+    query_date = record_date(date.today())
+
+    entry = await attendance().find_one_and_update(
+        {"Name": punch.name, "Date": query_date, "Leaving Time": None},
+        leaving_update(get_current_ist_time(), location),
+        projection={"_id": 1}
+    )
+    if entry is None:
+        if await attendance().find_one({"Name": punch.name, "Date": query_date}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail=ARRIVAL_MISSING)
+        raise HTTPException(status_code=409, detail=LEAVING_EXISTS)
+
+    schedule_followups(background_tasks, punch.name, query_date, 'Leaving Photo', photo)
+    return PunchResult(message=LEAVING_LOGGED, site=site)
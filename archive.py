@@ -0,0 +1,230 @@
+import argparse
+import glob
+import os
+import re
+from datetime import datetime, timedelta
+import pandas as pd
+from pymongo import DeleteOne
+
+from cache import cache
+from db import attendance_collection
+from instrumentation import span
+from times import IST, TIME_FIELDS
+
+# Hot/cold attendance storage. The attendance collection (hot) keeps the current month and the
+# HOT_MONTHS - 1 months before it. 'python archive.py run' moves every older, closed month into
+# one Parquet file under ARCHIVE_PATH (cold), without the photo references. query.py, charts.py,
+# export.py and rollups.py read both tiers; nothing changes while ATTENDANCE_ARCHIVE_PATH is unset.
+ARCHIVE_PATH = os.getenv("ATTENDANCE_ARCHIVE_PATH")
+HOT_MONTHS = int(os.getenv("ATTENDANCE_HOT_MONTHS", "3"))
+DELETE_BATCH_SIZE = 1000
+
+ARCHIVE_FIELDS = ['Name', 'Date', 'Arrival Time', 'Leaving Time', 'Hours Present', 'Arrival Location', 'Leaving Location', 'Updated At']
+UTC_FIELDS = TIME_FIELDS + ['Updated At']
+LOCATION_FIELDS = ['Arrival Location', 'Leaving Location']
+MONTH_FILE = re.compile(r'attendance-(\d{4})-(\d{2})\.parquet$')
+
+def archive_schema():
+    import pyarrow as pa
+
+    utc = pa.timestamp('ms', tz='UTC')
+    location = pa.list_(pa.float64())
+    return pa.schema([
+        ('Name', pa.string()),
+        # Midnight, like the Date of the attendance records
+        ('Date', pa.timestamp('ms')),
+        ('Arrival Time', utc),
+        ('Leaving Time', utc),
+        ('Hours Present', pa.float64()),
+        ('Arrival Location', location),
+        ('Leaving Location', location),
+        ('Updated At', utc)
+    ])
+
+def as_day(value):
+    # date, datetime or Timestamp to a naive midnight datetime
+    return pd.Timestamp(value).normalize().to_pydatetime()
+
+def month_path(month):
+    return os.path.join(ARCHIVE_PATH, f"attendance-{month:%Y-%m}.parquet")
+
+def next_month(month):
+    return (pd.Timestamp(month) + pd.offsets.MonthBegin(1)).to_pydatetime()
+
+def hot_cutoff(today=None):
+    # First day of the oldest month that stays in the attendance collection
+    today = today or datetime.now(IST).date()
+    return (pd.Timestamp(today).to_period('M').to_timestamp() - pd.DateOffset(months=HOT_MONTHS - 1)).to_pydatetime()
+
+def archived_months(start_date=None, end_date=None):
+    # First days of the archived months that overlap the range, oldest first
+    if ARCHIVE_PATH is None or not os.path.isdir(ARCHIVE_PATH):
+        return []
+    months = []
+    for path in glob.glob(os.path.join(ARCHIVE_PATH, 'attendance-*.parquet')):
+        match = MONTH_FILE.search(path)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    if start_date is not None:
+        months = [month for month in months if next_month(month) > as_day(start_date)]
+    if end_date is not None:
+        months = [month for month in months if month <= as_day(end_date)]
+    return sorted(months)
+
+def is_archived(day):
+    month = as_day(day).replace(day=1)
+    return month in archived_months(month, month)
+
+def archive_frame(records):
+    df = pd.DataFrame(records, columns=ARCHIVE_FIELDS)
+    df['Date'] = pd.to_datetime(df['Date'])
+    for column in UTC_FIELDS:
+        # pymongo's naive datetimes are UTC
+        df[column] = pd.to_datetime(df[column], utc=True)
+    df['Hours Present'] = pd.to_numeric(df['Hours Present'], errors='coerce')
+    for column in LOCATION_FIELDS:
+        df[column] = df[column].map(lambda value: [float(v) for v in value] if isinstance(value, (list, tuple)) else None)
+    return df
+
+def write_month(df, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.sort_values(['Date', 'Name'], ignore_index=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, schema=archive_schema(), preserve_index=False), tmp_path)
+    # Read back before the hot records are deleted
+    if pq.read_metadata(tmp_path).num_rows != len(df):
+        os.remove(tmp_path)
+        raise RuntimeError(f"Archive file {tmp_path} does not hold the {len(df)} records written to it")
+    os.replace(tmp_path, path)
+
+def archive_month(month):
+    projection = {'_id': 1, **{field: 1 for field in ARCHIVE_FIELDS}}
+    records = list(attendance_collection.find({'Date': {'$gte': month, '$lt': next_month(month)}}, projection))
+    if not records:
+        return 0
+    if any(isinstance(record.get(field), str) for record in records for field in TIME_FIELDS):
+        raise ValueError(f"{month:%B %Y} still has '%I:%M %p' punch times, run 'python migrations.py times' first")
+
+    df = archive_frame(records)
+    path = month_path(month)
+    if os.path.exists(path):
+        # Records imported or corrected into an archived month are folded in, the hot copy wins
+        existing = pd.read_parquet(path)
+        df = pd.concat([existing, df], ignore_index=True).drop_duplicates(['Name', 'Date'], keep='last')
+    write_month(df, path)
+
+    # A record edited since it was read keeps its newer 'Updated At' and stays hot until the next run
+    requests = [DeleteOne({'_id': record['_id'], 'Updated At': record.get('Updated At')}) for record in records]
+    for offset in range(0, len(requests), DELETE_BATCH_SIZE):
+        attendance_collection.bulk_write(requests[offset:offset + DELETE_BATCH_SIZE], ordered=False)
+    return len(records)
+
+def archive_closed_months(today=None):
+    if ARCHIVE_PATH is None:
+        raise RuntimeError("Set ATTENDANCE_ARCHIVE_PATH to the directory the archive should live in")
+    os.makedirs(ARCHIVE_PATH, exist_ok=True)
+    cutoff = hot_cutoff(today)
+    # Only the months that still have records, found on the (Date, Name) index
+    days = attendance_collection.distinct('Date', {'Date': {'$lt': cutoff}})
+    months = sorted({day.replace(day=1) for day in days})
+
+    # The photos stay in the photo store (other records may share them), the archive keeps no reference
+    archived = {month: archive_month(month) for month in months}
+    if archived:
+        cache.invalidate('attendance')
+    return archived
+
+def hot_keys(months, start_date, end_date, employee):
+    # (Name, Date) of hot records inside archived months: these win over their archived copy
+    start, end = months[0], next_month(months[-1])
+    if start_date is not None:
+        start = max(start, as_day(start_date))
+    if end_date is not None:
+        end = min(end, as_day(end_date) + timedelta(days=1))
+    query = {'Date': {'$gte': start, '$lt': end}}
+    if employee is not None and employee != 'All':
+        query['Name'] = employee
+    return {(entry['Name'], entry['Date']) for entry in attendance_collection.find(query, {'_id': 0, 'Name': 1, 'Date': 1})}
+
+def read_month(month, columns, start_date, end_date, employee):
+    filters = []
+    if start_date is not None:
+        filters.append(('Date', '>=', as_day(start_date)))
+    if end_date is not None:
+        filters.append(('Date', '<=', as_day(end_date)))
+    if employee is not None and employee != 'All':
+        filters.append(('Name', '==', employee))
+    df = pd.read_parquet(month_path(month), columns=columns, filters=filters or None)
+    for column in UTC_FIELDS:
+        if column in df:
+            # Back to naive UTC, the way pymongo returns the hot records
+            df[column] = df[column].dt.tz_convert(None)
+    return df
+
+def iter_archive(start_date=None, end_date=None, employee=None, fields=None):
+    # One frame per archived month in the range, columns Name, Date and fields (all when None)
+    months = archived_months(start_date, end_date)
+    if not months:
+        return
+    columns = ARCHIVE_FIELDS if fields is None else ['Name', 'Date'] + [field for field in fields if field in ARCHIVE_FIELDS[2:]]
+    shadowed = hot_keys(months, start_date, end_date, employee)
+    for month in months:
+        with span('read_archive', 'pandas'):
+            df = read_month(month, columns, start_date, end_date, employee)
+            if shadowed:
+                keys = pd.Series(list(zip(df['Name'], df['Date'].dt.to_pydatetime())), dtype=object)
+                df = df[~keys.isin(shadowed).to_numpy()].reset_index(drop=True)
+        yield df
+
+def read_archive(start_date=None, end_date=None, employee=None, fields=None):
+    # All archived records in the range as one frame, None when no archived month overlaps it
+    frames = list(iter_archive(start_date, end_date, employee, fields))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+def archive_records(df):
+    # Rows shaped like MongoDB documents: naive datetimes and None for missing values
+    df = df.astype(object).where(df.notna(), None)
+    for record in df.to_dict('records'):
+        for field, value in record.items():
+            if isinstance(value, pd.Timestamp):
+                record[field] = value.to_pydatetime()
+        yield record
+
+def archive_date_range():
+    months = archived_months()
+    if not months:
+        return None, None
+    first = read_month(months[0], ['Date'], None, None, None)['Date'].min()
+    last = read_month(months[-1], ['Date'], None, None, None)['Date'].max()
+    return first.date(), last.date()
+
+def clear_archive():
+    # Used by the benchmarks before they generate a fresh data set
+    for month in archived_months():
+        os.remove(month_path(month))
+
+def main():
+    parser = argparse.ArgumentParser(description='Move closed months of attendance records to the Parquet archive')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('run', help=f'Archive every month before the last {HOT_MONTHS} (ATTENDANCE_HOT_MONTHS)')
+    subparsers.add_parser('list', help='Show the archived months')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        archived = archive_closed_months()
+        for month, count in archived.items():
+            if count:
+                print(f"{month:%B %Y}: {count} records archived")
+        print(f"Done, {sum(archived.values())} records archived, attendance now starts {hot_cutoff():%B %Y}.")
+    elif args.command == 'list':
+        import pyarrow.parquet as pq
+
+        for month in archived_months():
+            print(f"{month:%Y-%m}  {pq.read_metadata(month_path(month)).num_rows} records")
+
+if __name__ == '__main__':
+    main()
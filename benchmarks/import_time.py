@@ -0,0 +1,103 @@
+"""Measure the cold import cost of each page module with python -X importtime.
+
+    python benchmarks/import_time.py --repeat 5 --save import_baseline.json
+    python benchmarks/import_time.py --compare import_baseline.json
+
+Every module is imported in a fresh interpreter. The report shows the cumulative import
+time, the heaviest top-level packages it pulled in, and whether it loaded the libraries
+the kiosk page should never need (plotly, pyarrow, PIL).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['main', 'logging_page', 'admin_page', 'charts', 'api']
+HEAVY_PACKAGES = ['pandas', 'plotly', 'pyarrow', 'PIL', 'pymongo', 'numpy']
+
+def importtime_lines(code):
+    # Lines look like 'import time:      1234 |      5678 |   package.module', nesting by indentation
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{code} failed: {result.stderr.splitlines()[-1]}")
+    lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name[1:].rstrip()
+        lines.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(cumulative)))
+    return lines
+
+def import_profile(module, startup):
+    lines = [line for line in importtime_lines(f'import {module}') if line[1] not in startup]
+    level, total_us = next((level, cumulative) for level, name, cumulative in lines if name == module)
+
+    # Direct imports of the module, grouped by top-level package
+    packages = {}
+    for line_level, name, cumulative in lines:
+        if line_level == level + 1:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + cumulative
+    loaded = {name.split('.')[0] for _, name, _ in lines}
+    return total_us, packages, loaded
+
+def measure(module, repeat, startup):
+    totals = []
+    for _ in range(repeat):
+        total_us, packages, loaded = import_profile(module, startup)
+        totals.append(total_us)
+    return {
+        'milliseconds': statistics.median(totals) / 1000,
+        'heavy': sorted(package for package in HEAVY_PACKAGES if package in loaded),
+        'top': sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Whatever the interpreter imports before running any code is left out
+    startup = {name for _, name, _ in importtime_lines('pass')}
+    results = {}
+    regressions = []
+    print(f"{'module':<14} {'ms':>8} {'vs base':>8}  heavy packages / top imports (ms)")
+    for module in args.modules:
+        try:
+            result = results[module] = measure(module, args.repeat, startup)
+        except RuntimeError as e:
+            # e.g. api without fastapi installed
+            print(f"{module:<14} {'-':>8} {'':>8}  {e}")
+            continue
+        ratio = ''
+        if module in baseline:
+            change = result['milliseconds'] / baseline[module]['milliseconds']
+            ratio = f"{change:.2f}x"
+            if change > args.threshold:
+                regressions.append(module)
+                ratio += ' !'
+        top = ', '.join(f"{name} {us / 1000:.0f}" for name, us in result['top'])
+        print(f"{module:<14} {result['milliseconds']:>8.1f} {ratio:>8}  [{', '.join(result['heavy'])}] {top}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compare attendance photo encoding paths: time per photo and bytes stored.
+
+    python benchmarks/photo_encoding.py --width 1280 --height 720 --repeat 30
+
+The input is a synthetic JPEG camera frame like the ones st.camera_input returns.
+'legacy png' is the original save_image(): full decode, default resize, PNG.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photo_store import encode_photo
+
+def legacy_save_image(data):
+    image = Image.open(io.BytesIO(data))
+    image = image.resize((250, 250))
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+def camera_frame(width, height, seed=3):
+    # Smooth gradients plus sensor-like noise, so the codecs have something realistic to chew on
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+def measure(encode, data, repeat):
+    encode(data)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = encode(data)
+    return (time.perf_counter() - start) / repeat * 1000, len(encoded)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    data = camera_frame(args.width, args.height)
+    print(f"Input: {args.width}x{args.height} JPEG, {len(data)} bytes")
+
+    candidates = [
+        ('legacy png', legacy_save_image),
+        ('png', lambda d: encode_photo(d, 'PNG')),
+        ('jpeg q85', lambda d: encode_photo(d, 'JPEG', 85)),
+        ('jpeg q70', lambda d: encode_photo(d, 'JPEG', 70)),
+        ('webp q80', lambda d: encode_photo(d, 'WEBP', 80)),
+        ('webp q60', lambda d: encode_photo(d, 'WEBP', 60)),
+    ]
+    print(f"{'format':<12} {'ms/photo':>10} {'bytes':>10}")
+    for label, encode in candidates:
+        elapsed_ms, size = measure(encode, data, args.repeat)
+        print(f"{label:<12} {elapsed_ms:>10.2f} {size:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Load test for the kiosk punch API: latency percentiles at many concurrent punches.
+
+    MONGODB_CONNECTION_STRING=mongodb://localhost:27017 uvicorn api:app --port 8000
+    python benchmarks/punch_api_load.py --url http://127.0.0.1:8000 --employees 500 --concurrency 200
+
+Point the API at a local mongod you do not mind filling: every run adds --employees synthetic
+names ('Load Test <run> <n>') to the employee directory, so run this script with the same
+MONGODB_CONNECTION_STRING / MONGODB_DATABASE as the API, and logs an arrival and a leaving
+for each of them on today's date. MONGODB_CONNECTION_STRING=mongomock:// is refused: the
+in-memory database only exists inside one process, and the API writes through motor.
+"""
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+import uuid
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connection_string
+from employees import register_employees
+from geofence import ALLOWED_LOCATION
+from photo_encoding import camera_frame
+
+async def punch(client, path, body, semaphore, latencies, failures):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            failures.append(body['name'])
+
+async def run_phase(client, path, names, photo, location, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = []
+    bodies = [
+        {'name': name, 'photo': photo, 'latitude': location[0], 'longitude': location[1]}
+        for name in names
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(punch(client, path, body, semaphore, latencies, failures) for body in bodies))
+    return time.perf_counter() - start, np.array(latencies), failures
+
+def report(label, elapsed, latencies, failures):
+    print(
+        f"{label:<8} {len(latencies):>7} {len(failures):>7} {len(latencies) / elapsed:>9.0f} "
+        f"{np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f} {latencies.max():>8.1f}"
+    )
+
+async def main_async(args):
+    photo = base64.b64encode(camera_frame(args.width, args.height)).decode('ascii')
+    run_id = uuid.uuid4().hex[:6]
+    names = [f"Load Test {run_id} {n:05d}" for n in range(args.employees)]
+    location = (args.latitude, args.longitude)
+    # The API only takes punches for active employees in the directory. Names its cached copy
+    # does not know yet are looked up in the database, so they are accepted at once.
+    register_employees(names)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        (await client.get('/health')).raise_for_status()
+        print(f"{args.employees} employees, concurrency {args.concurrency}, photo {len(photo)} base64 bytes")
+        print(f"{'phase':<8} {'punches':>7} {'failed':>7} {'punch/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label, path in (('arrival', '/arrival'), ('leaving', '/leaving')):
+            elapsed, latencies, failures = await run_phase(client, path, names, photo, location, args.concurrency)
+            report(label, elapsed, latencies, failures)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--latitude', type=float, default=ALLOWED_LOCATION[0])
+    parser.add_argument('--longitude', type=float, default=ALLOWED_LOCATION[1])
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+    if connection_string and connection_string.startswith('mongomock://'):
+        parser.error('the load test registers its employees in the database the API uses, start both against a mongod')
+    asyncio.run(main_async(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Simulate a MongoDB stall behind the write-ahead punch queue.
+
+    python benchmarks/punch_queue_stall.py --employees 300 --kiosks 8 --stall 2
+
+A stand-in collection hangs for --stall seconds and then fails every bulk_write while the
+database is 'down'. Kiosk threads keep punching arrivals the whole time. The script checks
+that punches are still acknowledged in milliseconds and that the queue grows. Once the
+database is back, everything must be flushed exactly once, and a replayed batch must change nothing.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import numpy as np
+from pymongo.errors import ServerSelectionTimeoutError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from punch import get_current_ist_time
+from punch_queue import PunchQueue
+
+class StandInCollection:
+    # Applies the two update shapes the queue sends (arrival upsert, leaving pipeline) to a dict
+    def __init__(self, stall_seconds):
+        self.stall_seconds = stall_seconds
+        self.down = True
+        self.records = {}
+        self.failed_calls = 0
+        self.lock = threading.Lock()
+
+    def bulk_write(self, requests, ordered=True):
+        if self.down:
+            time.sleep(self.stall_seconds)
+            self.failed_calls += 1
+            raise ServerSelectionTimeoutError('stand-in database is unreachable')
+        with self.lock:
+            for request in requests:
+                query, update = request._filter, request._doc
+                key = (query['Name'], query['Date'])
+                if isinstance(update, dict):
+                    self.records.setdefault(key, dict(update['$setOnInsert']))
+                else:
+                    record = self.records.get(key)
+                    if record is not None and record.get('Leaving Time') is None:
+                        record['Leaving Time'] = update[0]['$set']['Leaving Time']['$literal']
+
+def punch_all(queue, kind, names, kiosks):
+    latencies = []
+
+    def punch(name):
+        start = time.perf_counter()
+        queue.enqueue(kind, name, date.today(), get_current_ist_time())
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=kiosks) as executor:
+        list(executor.map(punch, names))
+    return np.array(latencies)
+
+def wait_for_empty(queue, timeout):
+    deadline = time.monotonic() + timeout
+    while queue.status()['Queued'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return queue.status()['Queued'] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=300)
+    parser.add_argument('--kiosks', type=int, default=8)
+    parser.add_argument('--stall', type=float, default=2.0, help='Seconds each write hangs while the database is down')
+    args = parser.parse_args()
+
+    names = [f"Employee {n:04d}" for n in range(args.employees)]
+    collection = StandInCollection(args.stall)
+
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue = PunchQueue(os.path.join(queue_dir, 'punches.db'), collection=collection, follow_ups=lambda punches: None).start()
+
+        latencies = punch_all(queue, 'arrival', names, args.kiosks)
+        status = queue.status()
+        print(f"Database down: {len(latencies)} arrivals acknowledged, p50 {np.percentile(latencies, 50):.2f} ms, "
+              f"p99 {np.percentile(latencies, 99):.2f} ms, queue depth {status['Queued']}, lag {status['Lag (s)']}s")
+        assert status['Queued'] == args.employees, 'every punch should be waiting in the queue'
+        assert np.percentile(latencies, 99) < args.stall * 1000 / 10, 'punches should not wait for the database'
+
+        # Long enough for the worker to hit the stall at least once
+        time.sleep(args.stall * 1.5)
+        assert collection.failed_calls > 0 and not collection.records
+        print(f"{collection.failed_calls} failed flush attempts, last error: {queue.status()['Last Error']}")
+
+        collection.down = False
+        started = time.perf_counter()
+        queue.wake.set()
+        assert wait_for_empty(queue, timeout=60 + args.stall), 'the queue should drain once the database is back'
+        print(f"Database back: queue drained in {time.perf_counter() - started:.2f}s")
+        assert len(collection.records) == args.employees
+
+        punch_all(queue, 'leaving', names, args.kiosks)
+        assert wait_for_empty(queue, timeout=10)
+        assert all(record['Leaving Time'] is not None for record in collection.records.values())
+
+        # Replaying what was already written (e.g. after a crash before the delete) is a no-op
+        snapshot = {key: dict(record) for key, record in collection.records.items()}
+        replay = [
+            {'kind': 'arrival', 'name': name, 'date': day, 'punched_at': get_current_ist_time(), 'location': None, 'photo': None}
+            for name, day in snapshot
+        ]
+        replay += [dict(punch, kind='leaving') for punch in replay]
+        queue.write_batch(replay)
+        assert collection.records == snapshot, 'replayed punches must not change the records'
+        print(f"Leavings flushed and replay was a no-op, {queue.status()['Flushed']} punches flushed in total.")
+
+if __name__ == '__main__':
+    main()
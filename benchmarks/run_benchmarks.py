@@ -0,0 +1,165 @@
+"""Time the attendance hot paths against a synthetic data set and compare with a baseline.
+
+    MONGODB_CONNECTION_STRING=mongodb://localhost:27017 python benchmarks/run_benchmarks.py --generate --employees 200 --days 730 --save baseline.json
+    MONGODB_CONNECTION_STRING=mongodb://localhost:27017 python benchmarks/run_benchmarks.py --compare baseline.json
+
+Each case reports the median wall time, the peak Python memory of one traced run and the
+bytes MongoDB sent back per run (from serverStatus, so use a mongod nobody else is using).
+MONGODB_CONNECTION_STRING=mongomock:// runs in memory; it needs --generate and reports no bytes.
+The data lives in MONGODB_DATABASE, 'attendance_bench' unless set. --archive moves the closed
+months to a scratch Parquet archive first, so the cases read both the hot and the cold tier.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DATABASE', 'attendance_bench')
+# Never the application's archive, the synthetic data set replaces whatever is in there
+os.environ['ATTENDANCE_ARCHIVE_PATH'] = os.path.join(tempfile.gettempdir(), f"{os.environ['MONGODB_DATABASE']}_archive")
+
+from archive import archive_closed_months
+from cache import cache
+from charts import build_attendance_figures
+from db import attendance_collection, database_name, get_client
+from photo_encoding import camera_frame
+from photo_store import encode_photo
+from query import RECORD_FIELDS, load_attendance
+from stats import calculate_attendance_stats, view_attendance
+from synthetic_attendance import generate_attendance
+
+def bytes_out():
+    try:
+        return get_client().admin.command('serverStatus')['network']['bytesOut']
+    except Exception:
+        # mongomock, or a user without clusterMonitor
+        return None
+
+def benchmark_cases(frame, photo):
+    start_date = pd.Timestamp(frame['Date'].min())
+    end_date = pd.Timestamp(frame['Date'].max())
+    # Cached loaders are benchmarked cold, the way the first rerun after a punch sees them
+    return {
+        'load_attendance[all]': lambda: (cache.clear(), load_attendance()),
+        'load_attendance[table]': lambda: (cache.clear(), load_attendance(fields=RECORD_FIELDS)),
+        'calculate_attendance_stats': lambda: calculate_attendance_stats(frame, 'All', 'All'),
+        'view_attendance': lambda: view_attendance(frame, start_date, end_date, 'All', RECORD_FIELDS + ['Days Present']),
+        'visualize_attendance[all]': lambda: build_attendance_figures(start_date, end_date, 'All'),
+        'visualize_attendance[employee]': lambda: build_attendance_figures(start_date, end_date, frame['Name'].iloc[0]),
+        'save_image': lambda: encode_photo(photo)
+    }
+
+def measure(func, repeat):
+    func()  # warm up
+    before = bytes_out()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    after = bytes_out()
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'seconds': statistics.median(times),
+        'peak_bytes': peak,
+        'transferred_bytes': (after - before) // repeat if before is not None and after is not None else None
+    }
+
+def run(repeat, only=None):
+    frame = load_attendance(fields=RECORD_FIELDS)
+    photo = camera_frame(1280, 720)
+    results = {}
+    for name, func in benchmark_cases(frame, photo).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(func, repeat)
+    meta = {
+        'records': attendance_collection.estimated_document_count(),
+        'employees': int(frame['Name'].nunique()),
+        'database': database_name,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'created': datetime.now().isoformat(timespec='seconds')
+    }
+    return {'meta': meta, 'results': results}
+
+def format_bytes(value):
+    if value is None:
+        return '-'
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+def report(run_result, baseline=None, threshold=1.2):
+    regressions = []
+    print(f"{run_result['meta']['records']} records, {run_result['meta']['employees']} employees")
+    print(f"{'case':<32} {'ms':>10} {'peak mem':>10} {'from mongo':>11} {'vs base':>8}")
+    for name, result in run_result['results'].items():
+        ratio = ''
+        base = (baseline or {}).get('results', {}).get(name)
+        if base:
+            change = result['seconds'] / base['seconds']
+            ratio = f"{change:.2f}x"
+            if change > threshold:
+                regressions.append(name)
+                ratio += ' !'
+        print(
+            f"{name:<32} {result['seconds'] * 1000:>10.1f} {format_bytes(result['peak_bytes']):>10} "
+            f"{format_bytes(result['transferred_bytes']):>11} {ratio:>8}"
+        )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', action='store_true', help='Regenerate the synthetic data set first')
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--photos', action='store_true')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--archive', action='store_true', help='Archive the closed months before timing')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='Run only the cases whose name contains one of these')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    if args.generate:
+        written = generate_attendance(args.employees, args.days, photos=args.photos, seed=args.seed)
+        print(f"Generated {written} records")
+    if args.archive:
+        archived = archive_closed_months()
+        print(f"Archived {sum(archived.values())} records")
+
+    result = run(args.repeat, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = report(result, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
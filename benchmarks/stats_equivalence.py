@@ -0,0 +1,138 @@
+"""Check the vectorised stats engine against the original row-loop implementations.
+
+    python benchmarks/stats_equivalence.py --rows 1000000 --employees 500
+
+Builds synthetic attendance frames shaped like load_attendance() output, asserts that
+stats.calculate_attendance_stats / stats.view_attendance return the same tables as the
+original functions for a spread of filters, and prints the timings of both.
+"""
+import argparse
+import warnings
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats import calculate_attendance_stats, view_attendance
+
+# Reference implementations, as they were in main.py before the rewrite
+def legacy_calculate_attendance_stats(df, employee, month):
+    df['Date'] = pd.to_datetime(df['Date'])
+    if month != 'All':
+        df = df[df['Date'].dt.strftime('%B %Y') == month]
+    
+    if employee != 'All':
+        df = df[df['Name'] == employee]
+    
+    stats = []
+    for name in df['Name'].unique():
+        employee_df = df[df['Name'] == name]
+        total_days = len(employee_df)
+        total_hours = employee_df['Hours Present'].sum()
+        leaves_taken = (employee_df['Arrival Time'].isna() | employee_df['Leaving Time'].isna()).sum()
+        
+        # Adjust for allowed leave
+        if leaves_taken > 1:
+            total_days -= (leaves_taken - 1)
+            # total_hours -= (leaves_taken - 1) * 8
+        
+        stats.append({
+            'Name': name,
+            'Total Days Present': total_days,
+            'Total Hours': round(total_hours, 2),
+            'Leaves Taken': leaves_taken
+        })
+    
+    return pd.DataFrame(stats)
+
+def legacy_view_attendance(df, start_date, end_date, employee, attributes):
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
+    
+    if employee != 'All':
+        df = df[df['Name'] == employee]
+    
+    # Calculate 'Days Present' if selected
+    if 'Days Present' in attributes:
+        df['Days Present'] = df.groupby('Name')['Date'].transform('nunique')
+    
+    return df[['Name', 'Date'] + attributes]
+
+def synthetic_frame(rows, employees, days, seed):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Employee {i}" for i in range(employees)], dtype=object)
+    dates = pd.date_range('2022-01-01', periods=days, freq='D').strftime('%Y-%m-%d').to_numpy(dtype=object)
+
+    arrival = np.where(rng.random(rows) < 0.03, None, '09:15 AM').astype(object)
+    leaving = np.where(rng.random(rows) < 0.08, None, '05:30 PM').astype(object)
+    hours = np.round(rng.uniform(3, 10, rows), 2).astype(object)
+    hours[pd.isna(leaving) | pd.isna(arrival)] = None
+
+    return pd.DataFrame({
+        'Name': names[rng.integers(0, employees, rows)],
+        'Date': dates[rng.integers(0, days, rows)],
+        'Arrival Time': arrival,
+        'Leaving Time': leaving,
+        'Hours Present': hours
+    })
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def assert_same(expected, actual, label):
+    expected = expected.reset_index(drop=True)
+    actual = actual.reset_index(drop=True)
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, atol=0.011)
+    print(f"  ok  {label} ({len(actual)} rows)")
+
+def check(rows, employees, days, seed):
+    df = synthetic_frame(rows, employees, days, seed)
+    # Chronological, so months[0] and months[-1] are the first and last month of the frame
+    months = pd.to_datetime(df['Date']).dt.to_period('M').drop_duplicates().sort_values().dt.strftime('%B %Y').to_list()
+    assert len(months) > 1, 'the frame should span a month boundary'
+    some_employee = df['Name'].iloc[0]
+    print(f"Frame: {rows} rows, {employees} employees, {days} days")
+
+    for employee in ['All', some_employee]:
+        for month in ['All', months[0], months[-1]]:
+            expected, legacy_time = timed(legacy_calculate_attendance_stats, df.copy(), employee, month)
+            actual, new_time = timed(calculate_attendance_stats, df, employee, month)
+            if expected.empty:
+                assert actual.empty, 'expected an empty stats table'
+                continue
+            assert_same(expected, actual, f"stats employee={employee!r} month={month!r}  legacy {legacy_time:.3f}s  new {new_time:.3f}s")
+
+    start_date = pd.Timestamp('2022-01-10')
+    end_date = pd.Timestamp('2022-03-01')
+    for employee in ['All', some_employee]:
+        for attributes in [['Hours Present'], ['Arrival Time', 'Leaving Time', 'Days Present'], ['Days Present', 'Hours Present']]:
+            expected, legacy_time = timed(legacy_view_attendance, df.copy(), start_date, end_date, employee, attributes)
+            actual, new_time = timed(view_attendance, df, start_date, end_date, employee, attributes)
+            assert_same(expected, actual, f"view employee={employee!r} attributes={attributes}  legacy {legacy_time:.3f}s  new {new_time:.3f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    # The legacy view_attendance assigns into a filtered slice (pandas 3 no longer has this warning)
+    setting_with_copy = getattr(pd.errors, 'SettingWithCopyWarning', None)
+    if setting_with_copy is not None:
+        warnings.simplefilter('ignore', setting_with_copy)
+
+    # Small frames cover the edge cases (repeated dates, one employee, the January/February
+    # boundary), the big one the timings
+    check(500, 3, 45, args.seed)
+    check(args.rows, args.employees, args.days, args.seed)
+    print('All results match.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Fill a scratch MongoDB database with synthetic attendance for benchmarking.
+
+    MONGODB_CONNECTION_STRING=mongodb://localhost:27017 python benchmarks/synthetic_attendance.py --employees 200 --days 730 --photos
+
+Writes N employees x M working days of punches in the shape log_arrival/log_leaving
+produce (typed punch times, locations, optional photo references), then rebuilds the
+rollups. The database defaults to 'attendance_bench' (MONGODB_DATABASE), never the app's.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_DATABASE', 'attendance_bench')
+# Never the application's archive, the synthetic data set replaces whatever is in there
+os.environ['ATTENDANCE_ARCHIVE_PATH'] = os.path.join(tempfile.gettempdir(), f"{os.environ['MONGODB_DATABASE']}_archive")
+
+from archive import clear_archive
+from cache import cache
+from db import attendance_collection, database_name, employees_collection, ensure_indexes, rollups_collection
+from employees import register_employees
+from geofence import ALLOWED_LOCATION
+from photo_store import encode_photo, get_photo_store
+from rollups import rebuild_rollups
+from times import IST
+
+BATCH_SIZE = 10000
+ABSENCE_RATE = 0.05
+MISSING_LEAVING_RATE = 0.04
+PHOTO_VARIANTS = 16
+
+def employee_names(employees):
+    return [f"Employee {n:04d}" for n in range(employees)]
+
+def working_days(start, days):
+    # Sundays off, like the offices this app runs in
+    dates = pd.date_range(start, periods=days, freq='D')
+    return dates[dates.dayofweek != 6]
+
+def photo_refs(variants, seed):
+    from photo_encoding import camera_frame
+
+    store = get_photo_store()
+    return [store.put(encode_photo(camera_frame(640, 480, seed=seed + n))) for n in range(variants)]
+
+def day_documents(day, names, rng, photos):
+    count = len(names)
+    present = rng.random(count) >= ABSENCE_RATE
+    names = np.asarray(names, dtype=object)[present]
+    count = len(names)
+
+    midnight = pd.Timestamp(day).tz_localize(IST)
+    arrival = midnight + pd.to_timedelta(9 * 60 + rng.normal(15, 20, count), unit='m')
+    leaving = arrival + pd.to_timedelta(rng.normal(8.25 * 60, 45, count), unit='m')
+    left = rng.random(count) >= MISSING_LEAVING_RATE
+    hours = np.round((leaving - arrival).total_seconds().to_numpy() / 3600, 2)
+    lats = ALLOWED_LOCATION[0] + rng.normal(0, 0.002, (count, 2))
+    lons = ALLOWED_LOCATION[1] + rng.normal(0, 0.002, (count, 2))
+    photo_picks = rng.integers(0, len(photos), (count, 2)) if photos else None
+
+    date_value = midnight.tz_localize(None).to_pydatetime()
+    arrival = arrival.to_pydatetime()
+    leaving = leaving.to_pydatetime()
+    documents = []
+    for i in range(count):
+        documents.append({
+            'Name': names[i],
+            'Date': date_value,
+            'Arrival Time': arrival[i],
+            'Leaving Time': leaving[i] if left[i] else None,
+            'Hours Present': float(hours[i]) if left[i] else None,
+            'Arrival Photo': photos[photo_picks[i, 0]] if photos else None,
+            'Leaving Photo': photos[photo_picks[i, 1]] if photos and left[i] else None,
+            'Arrival Location': [float(lats[i, 0]), float(lons[i, 0])],
+            'Leaving Location': [float(lats[i, 1]), float(lons[i, 1])] if left[i] else None,
+            'Updated At': leaving[i] if left[i] else arrival[i]
+        })
+    return documents
+
+def generate_attendance(employees, days, start=date(2023, 1, 1), photos=False, seed=7, batch_size=BATCH_SIZE):
+    if database_name == 'attendance_db':
+        raise ValueError("Refusing to generate synthetic data in the application database, set MONGODB_DATABASE")
+    # Always a fresh data set, so runs with the same arguments are comparable
+    attendance_collection.delete_many({})
+    rollups_collection.delete_many({})
+    employees_collection.delete_many({})
+    clear_archive()
+    ensure_indexes()
+
+    rng = np.random.default_rng(seed)
+    names = employee_names(employees)
+    refs = photo_refs(PHOTO_VARIANTS, seed) if photos else None
+
+    written = 0
+    batch = []
+    for day in working_days(start, days):
+        batch.extend(day_documents(day, names, rng, refs))
+        if len(batch) >= batch_size:
+            attendance_collection.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        attendance_collection.insert_many(batch, ordered=False)
+        written += len(batch)
+
+    register_employees(names)
+    rebuild_rollups()
+    cache.invalidate('attendance')
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2023, 1, 1))
+    parser.add_argument('--photos', action='store_true', help='Store a few encoded photos and reference them from the records')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate_attendance(args.employees, args.days, args.start, args.photos, args.seed)
+    print(f"{written} records written to '{database_name}' in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
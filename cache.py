@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from pymongo import ReturnDocument
+
+from db import settings_collection
+
+# How long a process trusts its copy of the version counters before asking MongoDB again.
+# Writes made by this process are seen immediately, writes from other processes within this window.
+VERSION_CHECK_SECONDS = 2
+MAX_ENTRIES = 128
+
+class VersionedCache:
+    # Entries are grouped into namespaces ('attendance', 'settings'). Every write bumps the
+    # namespace's counter in the settings collection, which invalidates the cached entries
+    # in every process and session at once.
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.versions_checked_at = 0.0
+        self.hits = {}
+        self.misses = {}
+
+    def _refresh_versions(self):
+        now = time.monotonic()
+        if now - self.versions_checked_at < VERSION_CHECK_SECONDS:
+            return
+        setting = settings_collection.find_one({"setting": "data_version"}, {"_id": 0, "value": 1})
+        with self.lock:
+            self.versions = dict(setting["value"]) if setting else {}
+            self.versions_checked_at = now
+
+    def version(self, namespace):
+        self._refresh_versions()
+        return self.versions.get(namespace, 0)
+
+    def get(self, namespace, key, loader, ttl=None):
+        version = self.version(namespace)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is not None:
+                entry_version, stored_at, value = entry
+                if entry_version == version and (ttl is None or now - stored_at < ttl):
+                    self.entries.move_to_end((namespace, key))
+                    self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                    return value
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+
+        value = loader()
+        with self.lock:
+            self.entries[(namespace, key)] = (version, now, value)
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace):
+        setting = settings_collection.find_one_and_update(
+            {"setting": "data_version"},
+            {"$inc": {f"value.{namespace}": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        with self.lock:
+            self.versions = dict(setting["value"])
+            self.versions_checked_at = time.monotonic()
+            for cache_key in [cache_key for cache_key in self.entries if cache_key[0] == namespace]:
+                del self.entries[cache_key]
+
+    def clear(self):
+        # Drops this process's entries only, other processes keep theirs (used by the benchmarks)
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            namespaces = sorted(set(self.hits) | set(self.misses) | {namespace for namespace, _ in self.entries})
+            return [
+                {
+                    'Cache': namespace,
+                    'Hits': self.hits.get(namespace, 0),
+                    'Misses': self.misses.get(namespace, 0),
+                    'Entries': sum(1 for cache_namespace, _ in self.entries if cache_namespace == namespace),
+                    'Version': self.versions.get(namespace, 0)
+                }
+                for namespace in namespaces
+            ]
+
+# Shared by every session in this process (modules survive Streamlit reruns)
+cache = VersionedCache()
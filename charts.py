@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from archive import iter_archive
+from cache import cache
+from db import attendance_collection, rollups_collection
+from query import to_query_date
+from times import IST, TIME_FIELDS
+
+# Chart data for visualize_attendance, computed as bucketed aggregates inside MongoDB: the
+# browser gets one point per day (or week) instead of one per attendance record. Only
+# operators from MongoDB 4.2 (and mongomock) are used, so the benchmarks run in memory too.
+
+# Above this many points a series is drawn with WebGL (Scattergl) instead of SVG
+WEBGL_POINTS = 1000
+# Ranges longer than this many days get weekly arrival/leaving bands instead of daily ones
+DAILY_BAND_DAYS = 120
+BAND_PERCENTILES = [10, 50, 90]
+
+def date_match(start_date, end_date, employee):
+    match = {'Date': {'$gte': to_query_date(start_date), '$lte': to_query_date(end_date)}}
+    if employee is not None and employee != 'All':
+        match['Name'] = employee
+    return match
+
+def week_start(field):
+    # The Monday of the week of a midnight date ($dayOfWeek is 1 for Sunday, 2 for Monday)
+    days_since_monday = {'$mod': [{'$add': [{'$dayOfWeek': field}, 5]}, 7]}
+    return {'$subtract': [field, {'$multiply': [days_since_monday, 24 * 60 * 60 * 1000]}]}
+
+def daily_totals(start_date, end_date, employee):
+    # One day rollup per employee per day, so the count is the number of employees present
+    rows = rollups_collection.aggregate([
+        {'$match': {'Period': 'day', **date_match(start_date, end_date, employee)}},
+        {'$group': {'_id': '$Date', 'Employees': {'$sum': 1}, 'Hours': {'$sum': '$Hours'}}},
+        {'$sort': {'_id': 1}}
+    ])
+    return pd.DataFrame([{'Date': row['_id'], 'Employees': row['Employees'], 'Hours': row['Hours']} for row in rows], columns=['Date', 'Employees', 'Hours'])
+
+def weekly_hours(start_date, end_date, employee):
+    rows = rollups_collection.aggregate([
+        {'$match': {'Period': 'day', **date_match(start_date, end_date, employee)}},
+        {'$group': {'_id': week_start('$Date'), 'Hours': {'$sum': '$Hours'}}},
+        {'$sort': {'_id': 1}}
+    ])
+    return pd.DataFrame([{'Week': row['_id'], 'Hours': row['Hours']} for row in rows], columns=['Week', 'Hours'])
+
+def employee_hours(start_date, end_date):
+    rows = rollups_collection.aggregate([
+        {'$match': {'Period': 'day', **date_match(start_date, end_date, 'All')}},
+        {'$group': {'_id': '$Name', 'Hours': {'$sum': '$Hours'}}},
+        {'$sort': {'Hours': -1}}
+    ])
+    return pd.DataFrame([{'Name': row['_id'], 'Hours': row['Hours']} for row in rows], columns=['Name', 'Hours'])
+
+# India has kept a fixed UTC offset since 1945, so IST is a constant number of minutes
+IST_OFFSET_MINUTES = 330
+
+def clock_minutes(field):
+    # Minutes past midnight IST for typed punch times; missing or legacy string times are dropped.
+    # In the BSON comparison order only dates (and timestamps) sort above booleans.
+    minutes = {'$mod': [{'$add': [{'$multiply': [{'$hour': field}, 60]}, {'$minute': field}, IST_OFFSET_MINUTES]}, 24 * 60]}
+    return {'$cond': [{'$gt': [field, True]}, minutes, '$$REMOVE']}
+
+def archived_band_values(start_date, end_date, employee, weekly):
+    # The same per-bucket minute lists for months in the Parquet archive, computed with pandas
+    values = {}
+    for archived in iter_archive(start_date, end_date, employee, TIME_FIELDS):
+        bucket = archived['Date'] - pd.to_timedelta(archived['Date'].dt.dayofweek, unit='D') if weekly else archived['Date']
+        minutes = {}
+        for field, column in zip(('arrival', 'leaving'), TIME_FIELDS):
+            ist = archived[column].dt.tz_localize('UTC').dt.tz_convert(IST)
+            minutes[field] = ist.dt.hour * 60 + ist.dt.minute
+        for key, group in pd.DataFrame(minutes).groupby(bucket):
+            row = values.setdefault(key.to_pydatetime(), {'arrival': [], 'leaving': []})
+            for field in ('arrival', 'leaving'):
+                row[field] += group[field].dropna().tolist()
+    return values
+
+def time_bands(start_date, end_date, employee):
+    # Per-bucket arrival/leaving percentiles. MongoDB ships only the minute values per bucket,
+    # the percentiles are taken here with numpy ($percentile needs MongoDB 7).
+    weekly = (end_date - start_date).days > DAILY_BAND_DAYS
+    rows = attendance_collection.aggregate([
+        {'$match': date_match(start_date, end_date, employee)},
+        {'$project': {'_id': 0, 'Date': 1, 'arrival': clock_minutes('$Arrival Time'), 'leaving': clock_minutes('$Leaving Time')}},
+        {'$group': {'_id': week_start('$Date') if weekly else '$Date', 'arrival': {'$push': '$arrival'}, 'leaving': {'$push': '$leaving'}}},
+        {'$sort': {'_id': 1}}
+    ])
+
+    buckets = {row['_id']: row for row in rows}
+    for bucket, archived in archived_band_values(start_date, end_date, employee, weekly).items():
+        row = buckets.setdefault(bucket, {'_id': bucket, 'arrival': [], 'leaving': []})
+        row['arrival'] += archived['arrival']
+        row['leaving'] += archived['leaving']
+
+    bands = []
+    for row in sorted(buckets.values(), key=lambda row: row['_id']):
+        band = {'Date': row['_id']}
+        for field in ('arrival', 'leaving'):
+            values = np.asarray(row[field], dtype=float) / 60
+            percentiles = np.percentile(values, BAND_PERCENTILES) if len(values) else [np.nan] * len(BAND_PERCENTILES)
+            for percentile, value in zip(BAND_PERCENTILES, percentiles):
+                band[f'{field} p{percentile}'] = value
+        bands.append(band)
+    return pd.DataFrame(bands), weekly
+
+def scatter(x, y, **kwargs):
+    # Same trace, drawn with WebGL once the series gets long
+    trace = go.Scattergl if len(x) > WEBGL_POINTS else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+def line_figure(x, y, title, yaxis_title):
+    fig = go.Figure(scatter(x, y, mode='lines', name=yaxis_title))
+    fig.update_layout(title=title, xaxis_title='Date', yaxis_title=yaxis_title)
+    return fig
+
+def band_figure(bands, weekly):
+    fig = go.Figure()
+    colors = {'arrival': '31, 119, 180', 'leaving': '255, 127, 14'}
+    low, mid, high = (f'p{percentile}' for percentile in BAND_PERCENTILES)
+    for field, color in colors.items():
+        label = field.capitalize()
+        fig.add_trace(scatter(bands['Date'], bands[f'{field} {high}'], mode='lines', line={'width': 0}, showlegend=False, hoverinfo='skip'))
+        fig.add_trace(scatter(
+            bands['Date'], bands[f'{field} {low}'], mode='lines', line={'width': 0}, fill='tonexty',
+            fillcolor=f'rgba({color}, 0.2)', name=f'{label} {low}-{high}'
+        ))
+        fig.add_trace(scatter(bands['Date'], bands[f'{field} {mid}'], mode='lines', line={'color': f'rgb({color})'}, name=f'{label} median'))
+    fig.update_layout(
+        title=f"Arrival and Leaving Times ({'weekly' if weekly else 'daily'} {low}/{mid}/{high})",
+        xaxis_title='Week' if weekly else 'Date',
+        yaxis_title='Hour of day (IST)'
+    )
+    return fig
+
+def build_attendance_figures(start_date, end_date, employee):
+    daily = daily_totals(start_date, end_date, employee)
+    if daily.empty:
+        return []
+
+    figures = []
+    if employee == 'All':
+        figures.append(('Employees Present Per Day', line_figure(daily['Date'], daily['Employees'], 'Employees Present Per Day', 'Number of Employees')))
+    else:
+        figures.append(('Hours Present Per Day', line_figure(daily['Date'], daily['Hours'], 'Hours Present Per Day', 'Hours Present')))
+
+    weekly = weekly_hours(start_date, end_date, employee)
+    fig_weekly = go.Figure(go.Bar(x=weekly['Week'], y=weekly['Hours']))
+    fig_weekly.update_layout(title='Hours Present Per Week', xaxis_title='Week', yaxis_title='Hours Present')
+    figures.append(('Hours Present Per Week', fig_weekly))
+
+    if employee == 'All':
+        per_employee = employee_hours(start_date, end_date)
+        fig_employees = go.Figure(go.Bar(x=per_employee['Name'], y=per_employee['Hours']))
+        fig_employees.update_layout(title='Total Hours Present Per Employee', xaxis_title='Name', yaxis_title='Hours Present')
+        figures.append(('Total Hours Present Per Employee', fig_employees))
+
+    bands, weekly_bands = time_bands(start_date, end_date, employee)
+    if not bands.empty:
+        figures.append(('Arrival and Leaving Times', band_figure(bands, weekly_bands)))
+    return figures
+
+def attendance_figures(start_date, end_date, employee):
+    # Figures are cached per filter until the next attendance write
+    key = ('attendance_figures', to_query_date(start_date), to_query_date(end_date), employee)
+    return cache.get('attendance', key, lambda: build_attendance_figures(start_date, end_date, employee))
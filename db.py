@@ -0,0 +1,105 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+from instrumentation import command_listeners, instrument_collection
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get the connection string from environment variables
+connection_string = os.getenv("MONGODB_CONNECTION_STRING")
+# Benchmarks point this at a scratch database so they never touch the real records
+database_name = os.getenv("MONGODB_DATABASE", "attendance_db")
+
+def create_client():
+    if connection_string and connection_string.startswith("mongomock://"):
+        # In-memory stand-in for benchmarks and local experiments, never for the app itself
+        import mongomock
+        import mongomock.gridfs
+        mongomock.gridfs.enable_gridfs_integration()
+        return mongomock.MongoClient()
+    import pymongo
+    # Reports reply sizes to the Performance page when PERF_INSTRUMENTATION is set
+    return pymongo.MongoClient(connection_string, event_listeners=command_listeners())
+
+# Streamlit re-runs main.py on every interaction but imports this module only once, so all
+# reruns and sessions in a process share one client's pool. It is created on first use,
+# not at import, so pages that never touch MongoDB do not pay for pymongo.
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client()
+    return _client
+
+def get_database():
+    return get_client()[database_name]
+
+class LazyCollection:
+    # Stands in for a collection until the first call on it
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            # Wrapped for per-rerun timing when PERF_INSTRUMENTATION is set, see instrumentation.py
+            self._collection = instrument_collection(get_database()[self._name])
+        return getattr(self._collection, attr)
+
+attendance_collection = LazyCollection("attendance")
+settings_collection = LazyCollection("settings")
+rollups_collection = LazyCollection("attendance_rollups")
+employees_collection = LazyCollection("employees")
+
+# The kiosk API (api.py) talks to MongoDB through motor. It is imported lazily so the
+# Streamlit app and the command line tools do not need it installed.
+ASYNC_POOL_SIZE = int(os.getenv("MONGODB_ASYNC_POOL_SIZE", "100"))
+_async_client = None
+
+def get_async_db():
+    global _async_client
+    if _async_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _async_client = AsyncIOMotorClient(connection_string, maxPoolSize=ASYNC_POOL_SIZE)
+    return _async_client[database_name]
+
+_indexes_ready = False
+
+def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    import pymongo
+
+    try:
+        # One attendance record per employee per day
+        attendance_collection.create_index(
+            [("Name", pymongo.ASCENDING), ("Date", pymongo.ASCENDING)],
+            unique=True,
+            name="name_date_unique"
+        )
+    except pymongo.errors.OperationFailure as e:
+        # The arrival upserts and the imports rely on this index, so nothing may write without it
+        raise RuntimeError(
+            "Could not create the unique (Name, Date) index on attendance. "
+            "Remove the duplicate records with 'python migrations.py duplicates' and restart."
+        ) from e
+    # Date range scans, including the first/last date lookups
+    attendance_collection.create_index([("Date", pymongo.ASCENDING), ("Name", pymongo.ASCENDING)], name="date_name")
+    settings_collection.create_index("setting", unique=True, name="setting_unique")
+    # Per-employee day and month totals, see rollups.py
+    rollups_collection.create_index(
+        [("Period", pymongo.ASCENDING), ("Name", pymongo.ASCENDING), ("Date", pymongo.ASCENDING)],
+        unique=True,
+        name="period_name_date_unique"
+    )
+    rollups_collection.create_index([("Period", pymongo.ASCENDING), ("Date", pymongo.ASCENDING)], name="period_date")
+    # Employee directory, see employees.py
+    employees_collection.create_index("Name", unique=True, name="name_unique")
+    employees_collection.create_index([("Active", pymongo.ASCENDING), ("Name", pymongo.ASCENDING)], name="active_name")
+    _indexes_ready = True
@@ -0,0 +1,90 @@
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne
+
+from cache import cache
+from db import attendance_collection, employees_collection
+from times import IST
+
+# Employee directory documents look like {'Name': ..., 'Active': True, 'Added At': <date>}.
+# Name pickers read it through the cache below instead of scanning the attendance records,
+# and the statistics use it to list every active employee, including those with no records.
+
+# Seeded into an empty directory, this was the list hard-coded in attendance_logging_page
+DEFAULT_EMPLOYEES = ['Muzamil Javeed', 'Asim Sumair', 'Arsalan Ahmad', 'Mohammad Unaib', 'Talib Shabir', 'Syed Owais Bashir', 'Suhail Ulfath', 'Owais Mir', 'Numair', 'Jehangir','Ingila Irshad', 'Zaineb Khursheed', 'Tabarak','Syed Muntazir','Najma Fayaz','Afsa Imtiyaz','Bisma Nisar','Furkan shabir','Rafiya jan','Rehana Rashid ','Mufazila']
+
+def register_employees(names, active=True):
+    # Adds the names that are not in the directory yet, existing entries keep their flags
+    names = sorted({name for name in names if name})
+    if not names:
+        return 0
+    added_at = datetime.now(IST)
+    result = employees_collection.bulk_write([
+        UpdateOne({'Name': name}, {'$setOnInsert': {'Active': active, 'Added At': added_at}}, upsert=True)
+        for name in names
+    ], ordered=False)
+    if result.upserted_count:
+        cache.invalidate('employees')
+    return result.upserted_count
+
+def fetch_employees():
+    employees = list(employees_collection.find({}, {'_id': 0, 'Name': 1, 'Active': 1}).sort('Name', 1))
+    if not employees:
+        # First use: the old hard-coded list plus everyone who already has attendance records
+        register_employees(DEFAULT_EMPLOYEES)
+        sync_employees()
+        employees = list(employees_collection.find({}, {'_id': 0, 'Name': 1, 'Active': 1}).sort('Name', 1))
+    return employees
+
+def get_employees():
+    return list(cache.get('employees', 'directory', fetch_employees))
+
+def get_employee_names(active_only=True):
+    return [employee['Name'] for employee in get_employees() if employee.get('Active', True) or not active_only]
+
+def get_active_names():
+    return cache.get('employees', 'active_names', lambda: frozenset(get_employee_names()))
+
+def is_active_employee(name):
+    if name in get_active_names():
+        return True
+    # A name added by another process within the last version check is not in this process's
+    # copy yet, so a miss asks the directory itself (one lookup on the unique Name index)
+    return employees_collection.find_one({'Name': name, 'Active': {'$ne': False}}, {'_id': 1}) is not None
+
+def set_employee_active(name, active):
+    result = employees_collection.update_one({'Name': name}, {'$set': {'Active': active}})
+    cache.invalidate('employees')
+    return result.matched_count > 0
+
+def sync_employees():
+    # Names that only appear in the attendance records (imports, older versions) join the directory
+    return register_employees(attendance_collection.distinct('Name'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Employee directory maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='Show the directory')
+    subparsers.add_parser('sync', help='Add every name found in the attendance records')
+    add_parser = subparsers.add_parser('add', help='Add employees')
+    add_parser.add_argument('names', nargs='+')
+    for command in ('activate', 'deactivate'):
+        command_parser = subparsers.add_parser(command, help=f'{command.capitalize()} employees')
+        command_parser.add_argument('names', nargs='+')
+
+    args = parser.parse_args()
+    if args.command == 'list':
+        for employee in fetch_employees():
+            print(f"{employee['Name']}{'' if employee.get('Active', True) else ' (inactive)'}")
+    elif args.command == 'sync':
+        print(f"Done, {sync_employees()} employees added.")
+    elif args.command == 'add':
+        print(f"Done, {register_employees(args.names)} employees added.")
+    else:
+        for name in args.names:
+            if not set_employee_active(name, args.command == 'activate'):
+                print(f"{name} is not in the directory")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+
+from archive import archived_months, iter_archive, next_month
+from db import attendance_collection
+from query import RECORD_FIELDS, build_attendance_query
+from times import IST, format_time_columns, TIME_FIELDS
+
+# Rows per chunk: one pandas frame, one CSV write and one Parquet row group at a time
+CHUNK_SIZE = 50000
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+def export_columns(attributes):
+    return ['Name', 'Date'] + attributes
+
+def days_present_counts(query, start_date, end_date, employee):
+    # One record per employee per day, so days present is a count per name
+    counts = {
+        row['_id']: row['count']
+        for row in attendance_collection.aggregate([
+            {'$match': query},
+            {'$group': {'_id': '$Name', 'count': {'$sum': 1}}}
+        ])
+    }
+    for archived in iter_archive(start_date, end_date, employee, []):
+        for name, count in archived['Name'].value_counts().items():
+            counts[name] = counts.get(name, 0) + int(count)
+    return counts
+
+def hot_entries(query, projection, chunk_size, start=None, end=None):
+    # Hot records with start <= Date < end, in (Date, Name) order
+    bounds = ([{'Date': {'$gte': start}}] if start is not None else []) + ([{'Date': {'$lt': end}}] if end is not None else [])
+    segment = {'$and': [query] + bounds} if bounds else query
+    return attendance_collection.find(segment, projection).sort([('Date', 1), ('Name', 1)]).batch_size(chunk_size)
+
+def iter_attendance_frames(start_date=None, end_date=None, employee=None, attributes=RECORD_FIELDS, chunk_size=CHUNK_SIZE):
+    fields = [attribute for attribute in attributes if attribute in RECORD_FIELDS]
+    query, projection = build_attendance_query(start_date, end_date, employee, fields)
+    counts = days_present_counts(query, start_date, end_date, employee) if 'Days Present' in attributes else None
+
+    def chunks(entries):
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield records_frame(chunk, attributes, counts)
+                chunk = []
+        if chunk:
+            yield records_frame(chunk, attributes, counts)
+
+    # Rows come out in (Date, Name) order. Each archived month (archive.py) is merged with the
+    # hot records written into it since; hot months around and between them are streamed.
+    yielded = False
+    boundary = None
+    months = archived_months(start_date, end_date)
+    for month, archived in zip(months, iter_archive(start_date, end_date, employee, fields)):
+        for df in chunks(hot_entries(query, projection, chunk_size, boundary, month)):
+            yield df
+            yielded = True
+        boundary = next_month(month)
+        df = records_frame(archived, attributes, counts)
+        late = list(hot_entries(query, projection, chunk_size, month, boundary))
+        if late:
+            df = pd.concat([df, records_frame(late, attributes, counts)], ignore_index=True)
+            df = df.sort_values(['Date', 'Name'], kind='stable', ignore_index=True)
+        for offset in range(0, len(df), chunk_size):
+            yield df.iloc[offset:offset + chunk_size]
+            yielded = True
+    for df in chunks(hot_entries(query, projection, chunk_size, boundary)):
+        yield df
+        yielded = True
+    # An empty export still gets one (empty) frame, so the writers emit a header / schema
+    if not yielded:
+        yield records_frame([], attributes, counts)
+
+def records_frame(entries, attributes, counts):
+    df = pd.DataFrame(entries, columns=export_columns([a for a in attributes if a != 'Days Present']))
+    if counts is not None:
+        df['Days Present'] = df['Name'].map(counts)
+    return df[export_columns(attributes)]
+
+def write_csv(frames, output):
+    header = True
+    rows = 0
+    for df in frames:
+        df = format_time_columns(df)
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+        output.write(df.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+        rows += len(df)
+    return rows
+
+def parquet_schema(columns):
+    import pyarrow as pa
+
+    types = {
+        'Name': pa.string(),
+        'Date': pa.date32(),
+        'Arrival Time': pa.timestamp('ms', tz=IST.zone),
+        'Leaving Time': pa.timestamp('ms', tz=IST.zone),
+        'Hours Present': pa.float64(),
+        'Days Present': pa.int64()
+    }
+    return pa.schema([(column, types[column]) for column in columns])
+
+def parquet_frame(df):
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    for column in TIME_FIELDS:
+        if column in df:
+            # Typed timestamps only, any unmigrated '%I:%M %p' strings become nulls
+            values = pd.to_datetime(df[column].map(lambda value: None if isinstance(value, str) else value))
+            df[column] = values.dt.tz_localize('UTC').dt.tz_convert(IST)
+    if 'Hours Present' in df:
+        df['Hours Present'] = pd.to_numeric(df['Hours Present'], errors='coerce')
+    return df
+
+def write_parquet(frames, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for df in frames:
+            schema = parquet_schema(list(df.columns))
+            if writer is None:
+                writer = pq.ParquetWriter(output, schema)
+            # Each chunk becomes its own row group, so memory stays bounded by CHUNK_SIZE
+            writer.write_table(pa.Table.from_pandas(parquet_frame(df), schema=schema, preserve_index=False))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def export_attendance(output, export_format='csv', start_date=None, end_date=None, employee=None, attributes=RECORD_FIELDS, chunk_size=CHUNK_SIZE):
+    frames = iter_attendance_frames(start_date, end_date, employee, attributes, chunk_size)
+    if export_format == 'parquet':
+        return write_parquet(frames, output)
+    return write_csv(frames, output)
+
+def main():
+    parser = argparse.ArgumentParser(description='Export attendance records as CSV or Parquet')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='First date, YYYY-MM-DD')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='Last date, YYYY-MM-DD')
+    parser.add_argument('--employee', default='All')
+    parser.add_argument('--attributes', nargs='+', default=RECORD_FIELDS, choices=RECORD_FIELDS + ['Days Present'])
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--output', required=True, help="Output file, or '-' for stdout")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.output == '-':
+        rows = export_attendance(sys.stdout.buffer, args.format, args.start, args.end, args.employee, args.attributes, args.chunk_size)
+    else:
+        with open(args.output, 'wb') as output:
+            rows = export_attendance(output, args.format, args.start, args.end, args.employee, args.attributes, args.chunk_size)
+    print(f"Exported {rows} records in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import math
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+
+from cache import cache
+from db import attendance_collection, settings_collection
+
+# Used when no geofences have been configured in the settings collection
+ALLOWED_LOCATION = (34.1008979, 74.8099825)  #coordinates
+MAX_DISTANCE_KM = 1.0 # Maximum allowed distance in kilometers
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+GRID_DEGREES = 0.05  # Prefilter cell size, roughly 5 km
+SETTINGS_TTL_SECONDS = 60
+
+DEFAULT_GEOFENCES = [
+    {"name": "Main Campus", "type": "circle", "center": list(ALLOWED_LOCATION), "radius_km": MAX_DISTANCE_KM}
+]
+
+# Geofences are stored as
+#   {"setting": "geofences", "value": [
+#       {"name": "Main Campus", "type": "circle", "center": [lat, lon], "radius_km": 1.0},
+#       {"name": "Annex", "type": "polygon", "points": [[lat, lon], [lat, lon], [lat, lon], ...]}]}
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Works on scalars and numpy arrays alike
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def points_in_polygon(lats, lons, polygon):
+    # Ray casting, vectorised over the points
+    inside = np.zeros(len(lats), dtype=bool)
+    count = len(polygon)
+    for i in range(count):
+        lat1, lon1 = polygon[i]
+        lat2, lon2 = polygon[(i + 1) % count]
+        crosses = (lats < lat1) != (lats < lat2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            edge_lon = lon1 + (lats - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lons < edge_lon)
+    return inside
+
+class Geofence:
+    def __init__(self, config):
+        if not isinstance(config, dict):
+            raise ValueError(f"Each geofence must be an object with a name and a type, not {config!r}")
+        self.name = config.get('name') or 'Unnamed site'
+        self.type = config.get('type', 'circle')
+        try:
+            self.parse(config)
+        except KeyError as e:
+            raise ValueError(f"Geofence '{self.name}' is missing {e}") from e
+        except TypeError as e:
+            raise ValueError(f"Geofence '{self.name}' is malformed: {e}") from e
+
+    def parse(self, config):
+        if self.type == 'circle':
+            self.center = tuple(float(value) for value in config['center'])
+            if len(self.center) != 2:
+                raise ValueError(f"Geofence '{self.name}' needs a [lat, lon] center")
+            self.radius_km = float(config['radius_km'])
+            if self.radius_km <= 0:
+                raise ValueError(f"Geofence '{self.name}' needs a positive radius_km")
+            lat, lon = self.center
+            lat_margin = self.radius_km / KM_PER_DEGREE_LAT
+            lon_margin = self.radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+            self.bbox = (lat - lat_margin, lon - lon_margin, lat + lat_margin, lon + lon_margin)
+        elif self.type == 'polygon':
+            try:
+                self.points = [(float(lat), float(lon)) for lat, lon in config['points']]
+            except ValueError as e:
+                raise ValueError(f"Geofence '{self.name}' needs [lat, lon] points: {e}") from e
+            if len(self.points) < 3:
+                raise ValueError(f"Geofence '{self.name}' needs at least three points")
+            lats = [lat for lat, _ in self.points]
+            lons = [lon for _, lon in self.points]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+        else:
+            raise ValueError(f"Unknown geofence type '{self.type}'")
+
+    def in_bbox(self, lats, lons):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+
+    def contains(self, lats, lons):
+        if self.type == 'circle':
+            return haversine_km(lats, lons, self.center[0], self.center[1]) <= self.radius_km
+        return points_in_polygon(lats, lons, self.points)
+
+def grid_cell(lat, lon):
+    return (math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES))
+
+class GeofenceIndex:
+    # Grid cells map to the sites whose bounding box touches them; a lookup checks the
+    # bounding boxes of that cell's sites and only then does the exact distance/polygon test.
+    def __init__(self, configs):
+        if not isinstance(configs, list):
+            raise ValueError("Geofences must be a list of sites")
+        if not configs:
+            # An empty list would read as 'not configured' and bring back the default site
+            raise ValueError("At least one geofence is needed, turn the location restriction off instead")
+        self.sites = [Geofence(config) for config in configs]
+        self.grid = defaultdict(list)
+        for position, site in enumerate(self.sites):
+            min_lat, min_lon, max_lat, max_lon = site.bbox
+            min_cell = grid_cell(min_lat, min_lon)
+            max_cell = grid_cell(max_lat, max_lon)
+            for lat_cell in range(min_cell[0], max_cell[0] + 1):
+                for lon_cell in range(min_cell[1], max_cell[1] + 1):
+                    self.grid[(lat_cell, lon_cell)].append(position)
+
+    def match(self, lat, lon):
+        lats = np.array([lat], dtype=float)
+        lons = np.array([lon], dtype=float)
+        for position in self.grid.get(grid_cell(lat, lon), ()):
+            site = self.sites[position]
+            if site.in_bbox(lats, lons)[0] and site.contains(lats, lons)[0]:
+                return site.name
+        return None
+
+    def match_many(self, coordinates):
+        # Site name (or None) for each (lat, lon); each site tests all candidate points in one go
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        lats, lons = coordinates[:, 0], coordinates[:, 1]
+        matches = np.full(len(coordinates), None, dtype=object)
+        unmatched = np.ones(len(coordinates), dtype=bool)
+        for site in self.sites:
+            candidates = np.flatnonzero(unmatched & site.in_bbox(lats, lons))
+            if len(candidates) == 0:
+                continue
+            hits = candidates[site.contains(lats[candidates], lons[candidates])]
+            matches[hits] = site.name
+            unmatched[hits] = False
+        return matches.tolist()
+
+def fetch_geofences():
+    setting = settings_collection.find_one({"setting": "geofences"})
+    return setting["value"] if setting and setting.get("value") else DEFAULT_GEOFENCES
+
+def get_geofences():
+    return cache.get('settings', 'geofences', fetch_geofences, ttl=SETTINGS_TTL_SECONDS)
+
+def get_geofence_index():
+    # The index itself is cached, so it is only rebuilt when the geofences change
+    return cache.get('settings', 'geofence_index', lambda: GeofenceIndex(get_geofences()), ttl=SETTINGS_TTL_SECONDS)
+
+def set_geofences(configs):
+    GeofenceIndex(configs)  # Raises ValueError for an invalid configuration
+    settings_collection.update_one(
+        {"setting": "geofences"},
+        {"$set": {"value": configs}},
+        upsert=True
+    )
+    cache.invalidate('settings')
+
+def match_allowed_location(lat, lon):
+    # Name of the geofence (site) containing the point, or None
+    return get_geofence_index().match(lat, lon)
+
+def is_within_allowed_location(lat, lon):
+    return match_allowed_location(lat, lon) is not None
+
+def fetch_location_restriction():
+    setting = settings_collection.find_one({"setting": "location_restriction"})
+    if setting:
+        return setting["value"]
+    else:
+        # Default to True if setting is not found
+        settings_collection.update_one(
+            {"setting": "location_restriction"},
+            {"$setOnInsert": {"value": True}},
+            upsert=True
+        )
+        return True
+
+def get_location_restriction():
+    return cache.get('settings', 'location_restriction', fetch_location_restriction, ttl=SETTINGS_TTL_SECONDS)
+
+def set_location_restriction(value):
+    settings_collection.update_one(
+        {"setting": "location_restriction"},
+        {"$set": {"value": value}},
+        upsert=True
+    )
+    cache.invalidate('settings')
+
+def audit_punch_locations(start_date=None, end_date=None, batch_size=10000):
+    # Re-checks the stored punch locations against the current geofences
+    query = {}
+    if start_date is not None or end_date is not None:
+        query['Date'] = {}
+        if start_date is not None:
+            query['Date']['$gte'] = start_date
+        if end_date is not None:
+            query['Date']['$lte'] = end_date
+    query['$or'] = [{'Arrival Location': {'$ne': None}}, {'Leaving Location': {'$ne': None}}]
+    projection = {'_id': 0, 'Name': 1, 'Date': 1, 'Arrival Location': 1, 'Leaving Location': 1}
+
+    index = GeofenceIndex(fetch_geofences())
+    checked = 0
+    outside = []
+    batch = []
+
+    def check_batch():
+        punches = [(entry, field) for entry in batch for field in ('Arrival Location', 'Leaving Location') if entry.get(field)]
+        sites = index.match_many([entry[field] for entry, field in punches])
+        for (entry, field), site in zip(punches, sites):
+            if site is None:
+                outside.append({'Name': entry['Name'], 'Date': entry['Date'], 'Punch': field.split()[0], 'Location': entry[field]})
+        return len(punches)
+
+    for entry in attendance_collection.find(query, projection).batch_size(batch_size):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            checked += check_batch()
+            batch = []
+    if batch:
+        checked += check_batch()
+    return checked, outside
+
+def main():
+    parser = argparse.ArgumentParser(description='Geofence tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    audit_parser = subparsers.add_parser('audit', help='Check stored punch locations against the current geofences')
+    audit_parser.add_argument('--start', type=datetime.fromisoformat, help='First date, YYYY-MM-DD')
+    audit_parser.add_argument('--end', type=datetime.fromisoformat, help='Last date, YYYY-MM-DD')
+
+    args = parser.parse_args()
+    if args.command == 'audit':
+        checked, outside = audit_punch_locations(args.start, args.end)
+        for punch in outside:
+            print(f"{punch['Date']:%Y-%m-%d}  {punch['Name']:<25} {punch['Punch']:<8} {punch['Location']}")
+        print(f"Checked {checked} punches, {len(outside)} outside every geofence.")
+
+if __name__ == '__main__':
+    main()
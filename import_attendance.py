@@ -0,0 +1,193 @@
+import argparse
+import os
+import time
+from datetime import datetime, time as clock
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import cache
+from db import attendance_collection, ensure_indexes
+from employees import sync_employees
+from rollups import refresh_rollups_many
+from times import IST
+
+BATCH_SIZE = 5000
+COLUMNS = ['Name', 'Date', 'Arrival Time', 'Leaving Time', 'Hours Present']
+REQUIRED_COLUMNS = ['Name', 'Date']
+TIME_FORMATS = ['%I:%M %p', '%I:%M:%S %p', '%H:%M', '%H:%M:%S']
+
+def canonical_columns(columns):
+    lookup = {column.lower(): column for column in COLUMNS}
+    return [lookup.get(str(column).strip().lower(), column) for column in columns]
+
+def read_csv_batches(path, batch_size):
+    for chunk in pd.read_csv(path, dtype=str, chunksize=batch_size, skipinitialspace=True):
+        chunk.columns = canonical_columns(chunk.columns)
+        yield chunk
+
+def excel_cell(value):
+    # Spreadsheet time cells come back as time/datetime objects, keep them comparable to CSV text
+    if isinstance(value, clock):
+        return value.strftime('%H:%M:%S')
+    return value
+
+def read_excel_batches(path, batch_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = canonical_columns(next(rows, ()))
+        batch = []
+        for row in rows:
+            batch.append([excel_cell(value) for value in row])
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def parse_clock_column(values):
+    # Time of day as a timedelta; accepts 12 and 24 hour text as well as full datetimes
+    values = values.map(lambda value: value.strftime('%H:%M:%S') if isinstance(value, datetime) else value)
+    text = values.astype('string').str.strip().str.upper()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for time_format in TIME_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=time_format, errors='coerce')
+    return parsed - parsed.dt.normalize()
+
+def normalise_batch(df, dayfirst):
+    # Same document shape as log_arrival / log_leaving produce, minus photos and locations
+    for column in COLUMNS:
+        if column not in df:
+            df[column] = None
+
+    names = df['Name'].astype('string').str.strip()
+    dates = pd.to_datetime(df['Date'], errors='coerce', dayfirst=dayfirst).dt.normalize()
+
+    arrival_clock = parse_clock_column(df['Arrival Time'])
+    leaving_clock = parse_clock_column(df['Leaving Time'])
+
+    # Times are on the record's (IST) calendar day; a leaving time before arrival is on the next day
+    arrival = (dates + arrival_clock).dt.tz_localize(IST)
+    leaving = (dates + leaving_clock).dt.tz_localize(IST)
+    leaving = leaving.where(~(leaving < arrival), leaving + pd.Timedelta(days=1))
+
+    hours = ((leaving - arrival).dt.total_seconds() / 3600).round(2)
+    hours = hours.fillna(pd.to_numeric(df['Hours Present'], errors='coerce'))
+
+    has_arrival_text = df['Arrival Time'].notna() & (df['Arrival Time'].astype('string').str.strip() != '')
+    has_leaving_text = df['Leaving Time'].notna() & (df['Leaving Time'].astype('string').str.strip() != '')
+    valid = (
+        names.notna() & (names != '') & dates.notna()
+        & ~(has_arrival_text & arrival.isna())
+        & ~(has_leaving_text & leaving.isna())
+    ).fillna(False).to_numpy(dtype=bool)
+
+    records = pd.DataFrame({
+        'Name': names,
+        'Date': dates,
+        'Arrival Time': arrival.astype(object).where(arrival.notna(), None),
+        'Leaving Time': leaving.astype(object).where(leaving.notna(), None),
+        'Hours Present': hours.astype(object).where(hours.notna(), None)
+    })
+    return records[valid], df[~valid]
+
+def upsert_requests(records, imported_at):
+    requests = []
+    for name, day, arrival_time, leaving_time, hours_present in records.itertuples(index=False, name=None):
+        requests.append(UpdateOne(
+            {'Name': name, 'Date': day},
+            {
+                '$set': {
+                    'Arrival Time': arrival_time,
+                    'Leaving Time': leaving_time,
+                    'Hours Present': hours_present,
+                    'Updated At': imported_at
+                },
+                '$setOnInsert': {
+                    'Arrival Photo': None,
+                    'Leaving Photo': None,
+                    'Arrival Location': None,
+                    'Leaving Location': None
+                }
+            },
+            upsert=True
+        ))
+    return requests
+
+def import_attendance(path, batch_size=BATCH_SIZE, dayfirst=False, update_rollups=True):
+    # The upserts rely on the unique (Name, Date) index to keep one record per employee per day
+    ensure_indexes()
+    reader = read_excel_batches if path.lower().endswith(('.xlsx', '.xlsm')) else read_csv_batches
+    started = time.perf_counter()
+    totals = {'rows': 0, 'written': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'errors': 0}
+    # (Name, Date) of every imported record, so only their days and months get new rollups
+    imported = set()
+
+    for batch in reader(path, batch_size):
+        missing = [column for column in REQUIRED_COLUMNS if column not in batch]
+        if missing:
+            raise ValueError(f"{path} is missing column(s): {', '.join(missing)}")
+
+        records, rejected = normalise_batch(batch, dayfirst)
+        # The same employee and day twice in one file: the last row wins, like a re-import would
+        records = records.drop_duplicates(['Name', 'Date'], keep='last')
+
+        totals['rows'] += len(batch)
+        totals['rejected'] += len(rejected)
+        for row in rejected.head(5).itertuples(index=False):
+            print(f"Rejected row: {tuple(row)}")
+
+        if len(records):
+            try:
+                result = attendance_collection.bulk_write(upsert_requests(records, datetime.now(IST)), ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                totals['errors'] += len(details.get('writeErrors', []))
+            totals['inserted'] += details.get('nUpserted', 0)
+            totals['updated'] += details.get('nModified', 0)
+            totals['written'] += len(records)
+            imported.update(zip(records['Name'], (day.to_pydatetime() for day in records['Date'])))
+
+        elapsed = time.perf_counter() - started
+        print(f"{totals['rows']} rows read, {totals['written']} written, {totals['rejected']} rejected ({totals['rows'] / elapsed:,.0f} rows/s)")
+
+    if update_rollups and imported:
+        print("Refreshing attendance rollups...")
+        days, months = refresh_rollups_many(imported)
+        print(f"{days} day rollups refreshed in {months} months")
+    cache.invalidate('attendance')
+    # Imported names show up in the admin pickers and statistics
+    totals['employees added'] = sync_employees()
+
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import historical attendance from CSV or Excel')
+    parser.add_argument('path', help='.csv or .xlsx file with Name, Date, Arrival Time, Leaving Time[, Hours Present] columns')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dayfirst', action='store_true', help='Dates are written day first, e.g. 31/01/2024')
+    parser.add_argument('--skip-rollups', action='store_true', help="Do not refresh the rollups afterwards (run 'python rollups.py rebuild' later)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist")
+
+    totals = import_attendance(args.path, args.batch_size, args.dayfirst, not args.skip_rollups)
+    print(
+        f"Done in {totals['seconds']:.1f}s: {totals['rows']} rows, {totals['inserted']} inserted, "
+        f"{totals['updated']} updated, {totals['rejected']} rejected, {totals['errors']} write errors "
+        f"({totals['rows'] / max(totals['seconds'], 1e-9):,.0f} rows/s)."
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# Per-rerun timing of MongoDB calls, pandas stages, plotting and image work, shown on the
+# admin 'Performance' page. Off unless PERF_INSTRUMENTATION=1; when off, timed() returns the
+# function itself and instrument_collection() the collection itself, so nothing is wrapped.
+ENABLED = os.getenv("PERF_INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+MAX_RERUNS = 50
+# 'load' covers a whole load_attendance() call, cache hit or not, so it overlaps the others
+SPAN_KINDS = ['load', 'mongo', 'pandas', 'plot', 'image']
+
+class Rerun:
+    def __init__(self, label):
+        self.label = label
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+
+    def add(self, name, kind, seconds, documents, size):
+        self.spans.append({'name': name, 'kind': kind, 'seconds': seconds, 'documents': documents, 'bytes': size})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def summary(self):
+        row = {'Rerun': self.label, 'Started': self.started_at.strftime('%H:%M:%S'), 'Total ms': round(self.seconds * 1000, 1)}
+        for kind in SPAN_KINDS:
+            row[f'{kind.capitalize()} ms'] = round(sum(s['seconds'] for s in self.spans if s['kind'] == kind) * 1000, 1)
+        row['Mongo calls'] = sum(1 for s in self.spans if s['kind'] == 'mongo')
+        row['Mongo docs'] = sum(s['documents'] for s in self.spans if s['kind'] == 'mongo')
+        row['Mongo bytes'] = sum(s['bytes'] for s in self.spans if s['kind'] == 'mongo')
+        return row
+
+_local = threading.local()
+_lock = threading.Lock()
+_reruns = deque(maxlen=MAX_RERUNS)
+# Process-wide counters per (kind, name): [calls, seconds, documents, bytes], background threads included
+_totals = {}
+
+def record(name, kind, seconds, documents=0, size=0):
+    current = getattr(_local, 'rerun', None)
+    if current is not None:
+        current.add(name, kind, seconds, documents, size)
+    with _lock:
+        totals = _totals.setdefault((kind, name), [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += documents
+        totals[3] += size
+
+@contextmanager
+def rerun(label):
+    if not ENABLED:
+        yield None
+        return
+    current = _local.rerun = Rerun(label)
+    try:
+        yield current
+    finally:
+        current.finish()
+        _local.rerun = None
+        with _lock:
+            _reruns.append(current)
+
+@contextmanager
+def span(name, kind):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, kind, time.perf_counter() - start)
+
+def timed(name, kind):
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def reply_counters():
+    return getattr(_local, 'reply_bytes', 0), getattr(_local, 'listener_seconds', 0.0)
+
+def command_listeners():
+    # Reply sizes come from the driver's command monitoring: one count per server reply (a
+    # whole batch of documents), on the thread that made the call. Passed to MongoClient.
+    if not ENABLED:
+        return []
+    import bson
+    from pymongo import monitoring
+
+    class ReplySizeListener(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            start = time.perf_counter()
+            size = len(bson.encode(event.reply))
+            _local.reply_bytes = getattr(_local, 'reply_bytes', 0) + size
+            # Left out of the span timings, the encoding is ours and not the database's
+            _local.listener_seconds = getattr(_local, 'listener_seconds', 0.0) + time.perf_counter() - start
+
+        def failed(self, event):
+            pass
+
+    return [ReplySizeListener()]
+
+class Measured:
+    # Seconds and reply bytes of the driver calls made inside the block
+    def __enter__(self):
+        self.size, self.overhead = reply_counters()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        size, overhead = reply_counters()
+        self.seconds = elapsed - (overhead - self.overhead)
+        self.size = size - self.size
+        return False
+
+class InstrumentedCursor:
+    # Times only the fetches (next()), not whatever the caller does between documents
+    def __init__(self, cursor, name):
+        self._cursor = cursor
+        self._name = name
+        self._documents = self._size = 0
+        self._seconds = 0.0
+        self._recorded = False
+
+    def __getattr__(self, attr):
+        value = getattr(self._cursor, attr)
+        if not callable(value):
+            return value
+
+        def chained(*args, **kwargs):
+            result = value(*args, **kwargs)
+            # sort(), limit(), batch_size() ... return the cursor itself
+            return self if result is self._cursor else result
+        return chained
+
+    def _record(self):
+        if not self._recorded:
+            self._recorded = True
+            record(self._name, 'mongo', self._seconds, self._documents, self._size)
+
+    def __next__(self):
+        measured = Measured()
+        try:
+            with measured:
+                document = next(self._cursor)
+        except StopIteration:
+            self._seconds += measured.seconds
+            self._size += measured.size
+            self._record()
+            raise
+        self._seconds += measured.seconds
+        self._size += measured.size
+        self._documents += 1
+        return document
+
+    next = __next__
+
+    def __iter__(self):
+        # A loop left early still records what it fetched
+        try:
+            while True:
+                try:
+                    document = self.__next__()
+                except StopIteration:
+                    return
+                yield document
+        finally:
+            self._record()
+
+    def close(self):
+        self._cursor.close()
+        self._record()
+
+class InstrumentedCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, attr):
+        return getattr(self._collection, attr)
+
+    def _timed_call(self, method, *args, **kwargs):
+        with Measured() as measured:
+            result = getattr(self._collection, method)(*args, **kwargs)
+        documents = len(result) if isinstance(result, list) else int(isinstance(result, dict))
+        record(f"{self._collection.name}.{method}", 'mongo', measured.seconds, documents, measured.size)
+        return result
+
+    def find(self, *args, **kwargs):
+        return InstrumentedCursor(self._collection.find(*args, **kwargs), f"{self._collection.name}.find")
+
+    def aggregate(self, *args, **kwargs):
+        return InstrumentedCursor(self._collection.aggregate(*args, **kwargs), f"{self._collection.name}.aggregate")
+
+    def find_one(self, *args, **kwargs):
+        return self._timed_call('find_one', *args, **kwargs)
+
+    def find_one_and_update(self, *args, **kwargs):
+        return self._timed_call('find_one_and_update', *args, **kwargs)
+
+    def insert_one(self, *args, **kwargs):
+        return self._timed_call('insert_one', *args, **kwargs)
+
+    def update_one(self, *args, **kwargs):
+        return self._timed_call('update_one', *args, **kwargs)
+
+    def distinct(self, *args, **kwargs):
+        return self._timed_call('distinct', *args, **kwargs)
+
+    def bulk_write(self, *args, **kwargs):
+        return self._timed_call('bulk_write', *args, **kwargs)
+
+def instrument_collection(collection):
+    return InstrumentedCollection(collection) if ENABLED else collection
+
+def recent_reruns():
+    with _lock:
+        return list(_reruns)
+
+def totals():
+    with _lock:
+        return [
+            {'Kind': kind, 'Name': name, 'Calls': calls, 'Seconds': round(seconds, 6), 'Documents': documents, 'Bytes': size}
+            for (kind, name), (calls, seconds, documents, size) in sorted(_totals.items())
+        ]
+
+def prometheus_text():
+    # Cumulative counters in the Prometheus text exposition format
+    metrics = [
+        ('attendance_span_calls_total', 'Instrumented calls', 'Calls'),
+        ('attendance_span_seconds_total', 'Time spent in instrumented calls', 'Seconds'),
+        ('attendance_mongo_documents_total', 'Documents returned by MongoDB calls', 'Documents'),
+        ('attendance_mongo_bytes_total', 'BSON bytes of the MongoDB replies', 'Bytes'),
+    ]
+    rows = totals()
+    lines = []
+    for metric, help_text, column in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for row in rows:
+            if column in ('Documents', 'Bytes') and row['Kind'] != 'mongo':
+                continue
+            lines.append(f'{metric}{{kind="{row["Kind"]}",name="{row["Name"]}"}} {row[column]}')
+    return '\n'.join(lines) + '\n'
+
+def json_lines():
+    # One line per span of each recent rerun
+    lines = []
+    for current in recent_reruns():
+        for s in current.spans:
+            lines.append(json.dumps({'rerun': current.label, 'started': current.started_at.isoformat(timespec='seconds'), **s}))
+    return '\n'.join(lines) + '\n'
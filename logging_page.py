@@ -0,0 +1,92 @@
+import streamlit as st
+import pandas as pd
+from datetime import date
+from streamlit_js_eval import get_geolocation
+
+from employees import get_employee_names
+from geofence import get_location_restriction, match_allowed_location
+from punch_queue import submit_arrival, submit_leaving, with_pending
+from times import format_time, format_time_columns
+from today import TODAY_COLUMNS, TodayAttendance
+
+# Kiosk page: arrival and leaving punches for today. Kept free of the admin page's imports.
+
+def attendance_logging_page():
+    st.title('Employee Attendance System')
+
+    # Get user's location
+    location = get_geolocation()
+
+    location_restriction = get_location_restriction()
+
+    punch_location = None
+    if location is not None:
+        punch_location = (location['coords']['latitude'], location['coords']['longitude'])
+
+    if location_restriction:
+        if punch_location is None:
+            st.warning('Waiting for location data...')
+            return
+
+        site = match_allowed_location(*punch_location)
+
+        if site is None:
+            st.error('You are not within the allowed location to log your attendance.')
+            return
+
+        st.caption(f"Location verified: {site}")
+
+    employees = get_employee_names()
+    selected_employee = st.selectbox('Select Employee', employees)
+
+    current_date = date.today()
+    
+    # Each session only keeps today's records, refreshed with small delta queries
+    if 'today' not in st.session_state or not st.session_state.today.is_for(current_date):
+        st.session_state.today = TodayAttendance(current_date)
+    else:
+        st.session_state.today.poll()
+    today = st.session_state.today
+
+    # Today's entry for the selected employee, including punches still waiting in the local queue
+    entry = with_pending(today, selected_employee, current_date)
+
+    if entry is None:
+        # No entry for today, show arrival log button and camera input
+        st.write("Please take a photo for attendance verification:")
+        img_file = st.camera_input("Take a picture")
+
+        if img_file is not None:
+            if st.button('Log Arrival Time'):
+                success, message = submit_arrival(selected_employee, current_date, img_file, punch_location, entry)
+                if success:
+                    today.refresh()  # Pick up the new record
+                    st.success(message)
+                    st.rerun()  # Force Streamlit to rerun the script
+                else:
+                    st.error(message)
+    else:
+        # Entry exists for today
+        if entry.get('Leaving Time') is None:
+            # Arrival logged, but leaving time not logged
+            st.info(f"Arrival time logged at: {format_time(entry['Arrival Time'])}")
+
+            st.write("Please take a photo for attendance verification:")
+            img_file = st.camera_input("Take a picture")
+
+            if img_file is not None:
+                if st.button('Log Leaving Time'):
+                    success, message = submit_leaving(selected_employee, current_date, img_file, punch_location, entry)
+                    if success:
+                        today.refresh()  # Pick up the updated record
+                        st.success(message)
+                        st.rerun()  # Force Streamlit to rerun the script
+                    else:
+                        st.error(message)
+        else:
+            # Both arrival and leaving times are logged
+            st.info(f"You have already logged both arrival ({format_time(entry['Arrival Time'])}) and leaving ({format_time(entry['Leaving Time'])}) times for today.")
+
+    # Display all employees' attendance records for today
+    st.write("Current Attendance Records for Today:")
+    st.dataframe(format_time_columns(pd.DataFrame(today.rows(), columns=TODAY_COLUMNS)))
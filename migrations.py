@@ -0,0 +1,136 @@
+import argparse
+from pymongo import DeleteMany, UpdateOne
+
+from cache import cache
+from db import attendance_collection
+from photo_store import PHOTO_FIELDS, get_photo_store
+from rollups import refresh_rollups
+from times import TIME_FIELDS, parse_clock_time, to_ist
+
+def migrate_in_batches(query, projection, convert, batch_size, label):
+    migrated = 0
+    last_id = None
+    while True:
+        # Walk the matching records in _id order so an interrupted run simply resumes
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = list(attendance_collection.find(batch_query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        requests = []
+        for entry in batch:
+            update = convert(entry)
+            if update:
+                requests.append(UpdateOne({"_id": entry["_id"]}, {"$set": update}))
+
+        if requests:
+            attendance_collection.bulk_write(requests, ordered=False)
+        migrated += len(requests)
+        last_id = batch[-1]["_id"]
+        print(f"{label}: {migrated} records migrated")
+
+    return migrated
+
+def migrate_photos(batch_size=200):
+    store = get_photo_store()
+
+    def convert(entry):
+        update = {}
+        for field in PHOTO_FIELDS:
+            if isinstance(entry.get(field), bytes):
+                update[field] = store.put(entry[field])
+        return update
+
+    return migrate_in_batches(
+        {"$or": [{field: {"$type": "binData"}} for field in PHOTO_FIELDS]},
+        {field: 1 for field in PHOTO_FIELDS},
+        convert,
+        batch_size,
+        'Photos'
+    )
+
+def migrate_times(batch_size=1000):
+    def convert(entry):
+        day = entry['Date'].date()
+        arrival_time = entry.get('Arrival Time')
+        leaving_time = entry.get('Leaving Time')
+
+        update = {}
+        try:
+            if isinstance(arrival_time, str):
+                arrival_time = update['Arrival Time'] = parse_clock_time(arrival_time, day)
+            if isinstance(leaving_time, str):
+                # A leaving time before the arrival time was on the next day
+                update['Leaving Time'] = parse_clock_time(leaving_time, day, after=to_ist(arrival_time))
+        except ValueError as e:
+            print(f"Skipping record {entry['_id']}: {e}")
+            return None
+        return update
+
+    return migrate_in_batches(
+        {"$or": [{field: {"$type": "string"}} for field in TIME_FIELDS]},
+        {'Date': 1, **{field: 1 for field in TIME_FIELDS}},
+        convert,
+        batch_size,
+        'Punch times'
+    )
+
+def record_completeness(entry):
+    # The record to keep: both punches over one, one over none, then the newest
+    return (entry.get('Leaving Time') is not None, entry.get('Arrival Time') is not None, entry['_id'])
+
+def remove_duplicates(batch_size=1000):
+    # Records written before the unique (Name, Date) index existed can have copies
+    groups = attendance_collection.aggregate([
+        {"$group": {"_id": {"Name": "$Name", "Date": "$Date"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    removed = 0
+    requests = []
+    days = []
+    projection = {"Arrival Time": 1, "Leaving Time": 1}
+    for group in groups:
+        entries = list(attendance_collection.find({"_id": {"$in": group["ids"]}}, projection))
+        keep = max(entries, key=record_completeness)
+        requests.append(DeleteMany({"_id": {"$in": [entry["_id"] for entry in entries if entry["_id"] != keep["_id"]]}}))
+        days.append((group["_id"]["Name"], group["_id"]["Date"]))
+        removed += len(entries) - 1
+        if len(requests) >= batch_size:
+            attendance_collection.bulk_write(requests, ordered=False)
+            requests = []
+            print(f"Duplicates: {removed} records removed")
+    if requests:
+        attendance_collection.bulk_write(requests, ordered=False)
+
+    for name, day in days:
+        refresh_rollups(name, day)
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description='Attendance database migrations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    photos_parser = subparsers.add_parser('photos', help='Move embedded attendance photos into the photo store')
+    photos_parser.add_argument('--batch-size', type=int, default=200)
+
+    times_parser = subparsers.add_parser('times', help="Convert '%%I:%%M %%p' punch time strings to dates")
+    times_parser.add_argument('--batch-size', type=int, default=1000)
+
+    duplicates_parser = subparsers.add_parser('duplicates', help='Keep one attendance record per employee and day')
+    duplicates_parser.add_argument('--batch-size', type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == 'photos':
+        migrated = migrate_photos(args.batch_size)
+    elif args.command == 'times':
+        migrated = migrate_times(args.batch_size)
+    elif args.command == 'duplicates':
+        migrated = remove_duplicates(args.batch_size)
+    cache.invalidate('attendance')
+    print(f"Done, {migrated} records migrated.")
+
+if __name__ == '__main__':
+    main()
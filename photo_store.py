@@ -0,0 +1,166 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_database
+from instrumentation import timed
+
+PHOTO_FIELDS = ['Arrival Photo', 'Leaving Photo']
+
+def photo_error_field(field):
+    # 'Arrival Photo' -> 'Arrival Photo Error', set when the photo could not be stored
+    return f"{field} Error"
+
+def photo_ref(data):
+    # Photos are content addressed, so the same image is only ever stored once
+    return hashlib.sha256(data).hexdigest()
+
+class FilesystemPhotoStore:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, ref):
+        return os.path.join(self.root, ref[:2], ref)
+
+    def put(self, data):
+        ref = photo_ref(data)
+        path = self._path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return ref
+
+    def get(self, ref):
+        try:
+            with open(self._path(ref), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+class GridFSPhotoStore:
+    def __init__(self, database, collection='photos'):
+        import gridfs
+
+        self.errors = gridfs.errors
+        self.fs = gridfs.GridFS(database, collection=collection)
+
+    def put(self, data):
+        ref = photo_ref(data)
+        if not self.fs.exists(ref):
+            try:
+                self.fs.put(data, _id=ref)
+            except self.errors.FileExists:
+                # Another kiosk stored the same photo first
+                pass
+        return ref
+
+    def get(self, ref):
+        try:
+            return self.fs.get(ref).read()
+        except self.errors.NoFile:
+            return None
+
+_photo_store = None
+
+def get_photo_store():
+    global _photo_store
+    if _photo_store is None:
+        # PHOTO_STORE_PATH switches to the on-disk backend (handy for local testing)
+        root = os.getenv("PHOTO_STORE_PATH")
+        _photo_store = FilesystemPhotoStore(root) if root else GridFSPhotoStore(get_database())
+    return _photo_store
+
+def load_photo(value):
+    if value is None:
+        return None
+    # Records written before the photo store existed still embed the PNG itself
+    if isinstance(value, bytes):
+        return value
+    return get_photo_store().get(value)
+
+# Photo pipeline: the camera frame is downscaled while it is decoded and re-encoded in the
+# configured format on a small worker pool, after the attendance record has been written.
+PHOTO_SIZE = (250, 250)
+PHOTO_FORMAT = os.getenv("PHOTO_FORMAT", "WEBP").upper()
+PHOTO_QUALITY = int(os.getenv("PHOTO_QUALITY", "80"))
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+MAX_PENDING_PHOTOS = int(os.getenv("PHOTO_MAX_PENDING", "32"))
+
+_photo_executor = ThreadPoolExecutor(max_workers=PHOTO_WORKERS, thread_name_prefix='photo')
+_photo_slots = threading.BoundedSemaphore(MAX_PENDING_PHOTOS)
+
+@timed('encode_photo', 'image')
+def encode_photo(data, format=PHOTO_FORMAT, quality=PHOTO_QUALITY):
+    # Pillow is only loaded once a photo is actually taken
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    # JPEG frames are decoded at the smallest scale that still covers the target size
+    image.draft('RGB', PHOTO_SIZE)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image = image.resize(PHOTO_SIZE, reducing_gap=2.0)  # Resize to 250x250 pixels
+
+    output = io.BytesIO()
+    if format == 'PNG':
+        image.save(output, format='PNG')
+    else:
+        image.save(output, format=format, quality=quality)
+    return output.getvalue()
+
+def check_photo(data):
+    # Cheap header and structure check, so a request with a broken upload can be refused
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ValueError(f"Photo is not a readable image: {e}") from e
+    if image_format not in ('JPEG', 'PNG', 'WEBP'):
+        raise ValueError(f"Photo must be JPEG, PNG or WebP, not {image_format}.")
+
+def store_photo(data):
+    return get_photo_store().put(encode_photo(data))
+
+# Photos that could not be encoded or stored by this process, shown on the admin page
+_photo_failures = {'count': 0, 'last_error': None}
+_photo_failures_lock = threading.Lock()
+
+def photo_failures():
+    with _photo_failures_lock:
+        return dict(_photo_failures)
+
+def store_and_attach(data, attach, failed):
+    try:
+        attach(store_photo(data))
+    except Exception as e:
+        with _photo_failures_lock:
+            _photo_failures['count'] += 1
+            _photo_failures['last_error'] = str(e)
+        print(f"Error storing photo: {e}")
+        if failed is not None:
+            try:
+                failed(str(e))
+            except Exception as e:
+                print(f"Error recording the photo failure: {e}")
+
+def attach_photo(data, attach, failed=None):
+    # attach(ref) records the stored photo on the attendance record, failed(message) a failure
+    def job():
+        try:
+            store_and_attach(data, attach, failed)
+        finally:
+            _photo_slots.release()
+
+    if not _photo_slots.acquire(blocking=False):
+        # Too many photos waiting already, do this one inline rather than grow the backlog
+        store_and_attach(data, attach, failed)
+        return None
+    return _photo_executor.submit(job)
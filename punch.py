@@ -0,0 +1,159 @@
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+
+from cache import cache
+from db import attendance_collection
+from photo_store import attach_photo, photo_error_field
+from rollups import refresh_rollups
+from times import IST
+
+# Arrival / leaving writes shared by the Streamlit page (main.py) and the kiosk API (api.py).
+# The update documents are built here once, so the sync and async clients write the same shape.
+
+ARRIVAL_LOGGED = "Arrival logged successfully."
+ARRIVAL_EXISTS = "Arrival already logged for today."
+LEAVING_LOGGED = "Leaving time logged successfully."
+ARRIVAL_MISSING = "Arrival not logged for today."
+LEAVING_EXISTS = "Leaving time already logged for today."
+
+def get_current_ist_time():
+    return datetime.now(IST)
+
+def record_date(date):
+    # Convert date to datetime for MongoDB query
+    return datetime.combine(date, datetime.min.time())
+
+def attach_record_photo(name, query_date, field, data):
+    # The record is already committed, the photo is encoded and stored off the request
+    def attach(photo_ref):
+        attendance_collection.update_one({"Name": name, "Date": query_date}, {"$set": {field: photo_ref}})
+
+    def failed(message):
+        # Kept on the record so the update page can say why the photo is missing
+        attendance_collection.update_one({"Name": name, "Date": query_date}, {"$set": {photo_error_field(field): message}})
+
+    return attach_photo(data, attach, failed)
+
+def after_punch(name, query_date):
+    refresh_rollups(name, query_date)
+    cache.invalidate('attendance')
+
+def arrival_update(arrival_time, location=None):
+    new_entry = {
+        'Arrival Time': arrival_time,
+        'Leaving Time': None,
+        'Hours Present': None,
+        'Arrival Photo': None,
+        'Leaving Photo': None,
+        'Arrival Location': list(location) if location else None,
+        'Leaving Location': None
+    }
+    return {"$setOnInsert": new_entry, "$currentDate": {"Updated At": True}}
+
+def log_arrival(name, date, photo, location=None):
+    query_date = record_date(date)
+
+    # A single upsert: the unique (Name, Date) index makes double submissions a no-op
+    try:
+        result = attendance_collection.update_one(
+            {"Name": name, "Date": query_date},
+            arrival_update(get_current_ist_time(), location),
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent submission for the same employee won the race
+        return False, ARRIVAL_EXISTS
+
+    if result.upserted_id is None:
+        return False, ARRIVAL_EXISTS
+
+    attach_record_photo(name, query_date, 'Arrival Photo', photo.getvalue())
+    after_punch(name, query_date)
+    return True, ARRIVAL_LOGGED
+
+def clock_minutes_expr(field):
+    # Same as parsing the field with '%I:%M %p', evaluated inside MongoDB (pre-migration records)
+    return {
+        "$let": {
+            "vars": {"parts": {"$split": [field, " "]}},
+            "in": {
+                "$let": {
+                    "vars": {
+                        "clock": {"$split": [{"$arrayElemAt": ["$$parts", 0]}, ":"]},
+                        "meridiem": {"$toUpper": {"$arrayElemAt": ["$$parts", 1]}}
+                    },
+                    "in": {
+                        "$add": [
+                            {"$multiply": [
+                                {"$add": [
+                                    {"$mod": [{"$toInt": {"$arrayElemAt": ["$$clock", 0]}}, 12]},
+                                    {"$cond": [{"$eq": ["$$meridiem", "PM"]}, 12, 0]}
+                                ]},
+                                60
+                            ]},
+                            {"$toInt": {"$arrayElemAt": ["$$clock", 1]}}
+                        ]
+                    }
+                }
+            }
+        }
+    }
+
+def legacy_hours_present_expr(leaving_time):
+    leaving_minutes = leaving_time.hour * 60 + leaving_time.minute
+    return {
+        "$let": {
+            "vars": {"diff": {"$subtract": [leaving_minutes, clock_minutes_expr("$Arrival Time")]}},
+            "in": {
+                "$round": [
+                    {"$divide": [
+                        # Handle case where leaving time is on the next day
+                        {"$cond": [{"$lt": ["$$diff", 0]}, {"$add": ["$$diff", 24 * 60]}, "$$diff"]},
+                        60
+                    ]},
+                    2
+                ]
+            }
+        }
+    }
+
+def hours_present_expr(leaving_time):
+    return {
+        "$cond": [
+            {"$eq": [{"$type": "$Arrival Time"}, "string"]},
+            legacy_hours_present_expr(leaving_time),
+            {"$round": [{"$divide": [{"$subtract": [leaving_time, "$Arrival Time"]}, 3600 * 1000]}, 2]}
+        ]
+    }
+
+def leaving_update(leaving_time, location=None):
+    # One conditional update that also works out Hours Present from the stored arrival time
+    return [
+        {
+            "$set": {
+                'Leaving Time': {"$literal": leaving_time},
+                'Hours Present': hours_present_expr(leaving_time),
+                'Leaving Location': {"$literal": list(location) if location else None},
+                'Updated At': "$$NOW"
+            }
+        }
+    ]
+
+def log_leaving(name, date, photo, location=None):
+    query_date = record_date(date)
+
+    entry = attendance_collection.find_one_and_update(
+        {"Name": name, "Date": query_date, "Leaving Time": None},
+        leaving_update(get_current_ist_time(), location),
+        projection={"_id": 1}
+    )
+
+    if entry is None:
+        # Nothing was updated, a second lookup only tells the two failure cases apart
+        if attendance_collection.find_one({"Name": name, "Date": query_date}, {"_id": 1}) is None:
+            return False, ARRIVAL_MISSING
+        return False, LEAVING_EXISTS
+
+    attach_record_photo(name, query_date, 'Leaving Photo', photo.getvalue())
+    after_punch(name, query_date)
+    return True, LEAVING_LOGGED
@@ -0,0 +1,337 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from cache import cache
+from db import attendance_collection
+from photo_store import attach_photo, photo_error_field
+from punch import (
+    ARRIVAL_EXISTS, LEAVING_EXISTS, ARRIVAL_MISSING,
+    arrival_update, get_current_ist_time, leaving_update, log_arrival, log_leaving, record_date
+)
+from rollups import refresh_rollups
+
+# Write-ahead punch queue. With PUNCH_QUEUE_PATH set, the logging page stores each punch in a
+# local SQLite database (WAL mode) and answers at once; a background thread sends the queued
+# punches to MongoDB in batches. Arrivals are $setOnInsert upserts and leavings only match a
+# record whose Leaving Time is still empty, so a batch that is sent twice changes nothing.
+QUEUE_PATH = os.getenv("PUNCH_QUEUE_PATH")
+FLUSH_BATCH_SIZE = 200
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+# A punch MongoDB refuses this many flushes in a row is moved to the failed_punches table
+MAX_WRITE_ATTEMPTS = 5
+# How long a flushed punch is remembered, so pages whose today view synced before the flush
+# refresh it instead of losing the punch between the queue and the view (today.POLL_SECONDS)
+FLUSHED_MEMORY_SECONDS = 60.0
+
+ARRIVAL_QUEUED = "Arrival logged successfully (queued)."
+LEAVING_QUEUED = "Leaving time logged successfully (queued)."
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS punches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    punched_at TEXT NOT NULL,
+    location TEXT,
+    photo BLOB,
+    queued_at REAL NOT NULL
+)
+"""
+
+FAILED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failed_punches (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    punched_at TEXT NOT NULL,
+    location TEXT,
+    photo BLOB,
+    queued_at REAL NOT NULL,
+    error TEXT,
+    failed_at REAL NOT NULL
+)
+"""
+
+TIME_FIELDS = {'arrival': ('Arrival Time', 'Arrival Photo'), 'leaving': ('Leaving Time', 'Leaving Photo')}
+
+def flush_follow_ups(punches):
+    # Photos and rollups for the punches that reached MongoDB, then one cache invalidation
+    for punch in punches:
+        if punch['photo']:
+            time_field, photo_field = TIME_FIELDS[punch['kind']]
+            # Only the punch that actually wrote the record gets its photo attached
+            key = {'Name': punch['name'], 'Date': punch['date'], time_field: punch['punched_at']}
+            attach_photo(
+                punch['photo'],
+                lambda ref, key=key, field=photo_field: attendance_collection.update_one(key, {'$set': {field: ref}}),
+                lambda message, key=key, field=photo_error_field(photo_field): attendance_collection.update_one(key, {'$set': {field: message}})
+            )
+    for name, day in {(punch['name'], punch['date']) for punch in punches}:
+        refresh_rollups(name, day)
+    cache.invalidate('attendance')
+
+class PunchQueue:
+    def __init__(self, path, collection=attendance_collection, follow_ups=flush_follow_ups):
+        self.path = path
+        self.collection = collection
+        self.follow_ups = follow_ups
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.last_flush_at = None
+        self.last_error = None
+        self.flushed = 0
+        # Write attempts per queued row id, for the punches MongoDB keeps refusing
+        self.attempts = {}
+        # (name, day) -> time.monotonic() of the last flush that wrote a punch for it
+        self.flushed_at = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # An acknowledged punch has to survive a power cut
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(SCHEMA)
+        self.conn.execute(FAILED_SCHEMA)
+        self.worker = None
+
+    def start(self):
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.run, name='punch-queue', daemon=True)
+            self.worker.start()
+        return self
+
+    def enqueue(self, kind, name, date, punched_at, location=None, photo=None):
+        # MongoDB keeps milliseconds, the photo attach matches on the stored time
+        punched_at = punched_at.replace(microsecond=punched_at.microsecond // 1000 * 1000)
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO punches (kind, name, day, punched_at, location, photo, queued_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, name, date.isoformat(), punched_at.isoformat(), json.dumps(list(location)) if location else None, photo, time.time())
+            )
+        self.wake.set()
+        return cursor.lastrowid
+
+    def pending(self, name, date):
+        # Queued punch times for one employee and day, e.g. {'arrival': datetime}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, punched_at FROM punches WHERE name = ? AND day = ? ORDER BY id",
+                (name, date.isoformat())
+            ).fetchall()
+        return {kind: datetime.fromisoformat(punched_at) for kind, punched_at in rows}
+
+    def read_batch(self, size):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, kind, name, day, punched_at, location, photo FROM punches ORDER BY id LIMIT ?", (size,)
+            ).fetchall()
+        return [
+            {
+                'id': row_id,
+                'kind': kind,
+                'name': name,
+                'date': record_date(datetime.fromisoformat(day).date()),
+                'punched_at': datetime.fromisoformat(punched_at),
+                'location': json.loads(location) if location else None,
+                'photo': photo
+            }
+            for row_id, kind, name, day, punched_at, location, photo in rows
+        ]
+
+    def write_batch(self, punches):
+        # Returns the punches MongoDB refused and the leavings held back, each with a reason.
+        # Arrivals go first, so a leaving queued right after its arrival finds the record; a
+        # leaving whose arrival was refused is held back, it would match nothing.
+        refused = self.send(
+            punches,
+            'arrival',
+            lambda p: UpdateOne({'Name': p['name'], 'Date': p['date']}, arrival_update(p['punched_at'], p['location']), upsert=True)
+        )
+        missing = {(p['name'], p['date']): message for p, message in refused}
+        held = [
+            (p, f"Arrival not written: {missing[p['name'], p['date']]}")
+            for p in punches if p['kind'] == 'leaving' and (p['name'], p['date']) in missing
+        ]
+        refused += self.send(
+            [p for p in punches if (p['name'], p['date']) not in missing],
+            'leaving',
+            lambda p: UpdateOne({'Name': p['name'], 'Date': p['date'], 'Leaving Time': None}, leaving_update(p['punched_at'], p['location']))
+        )
+        return refused, held
+
+    def send(self, punches, kind, request):
+        punches = [p for p in punches if p['kind'] == kind]
+        if not punches:
+            return []
+        try:
+            self.collection.bulk_write([request(p) for p in punches], ordered=False)
+        except BulkWriteError as e:
+            if e.details.get('writeConcernErrors') or not e.details.get('writeErrors'):
+                # Nothing is known to be durable, the whole batch is sent again
+                raise
+            # Unordered: every request not listed in writeErrors was applied
+            return [(punches[error['index']], error.get('errmsg', 'write error')) for error in e.details['writeErrors']]
+        return []
+
+    def flush(self, batch_size=FLUSH_BATCH_SIZE):
+        punches = self.read_batch(batch_size)
+        if not punches:
+            return 0
+        refused, held = self.write_batch(punches)
+        kept = {p['id'] for p, _ in refused + held}
+        written = [p for p in punches if p['id'] not in kept]
+
+        failed = []
+        for punch, message in refused:
+            self.attempts[punch['id']] = self.attempts.get(punch['id'], 0) + 1
+            if self.attempts[punch['id']] >= MAX_WRITE_ATTEMPTS:
+                failed.append((punch, message))
+        # A leaving whose arrival is given up on goes with it
+        given_up = {(p['name'], p['date']) for p, _ in failed if p['kind'] == 'arrival'}
+        failed += [(p, message) for p, message in held if (p['name'], p['date']) in given_up]
+
+        now = time.monotonic()
+        with self.lock:
+            # Remembered before the rows go, so a page never sees neither the queue nor the flush
+            for punch in written:
+                self.flushed_at[(punch['name'], punch['date'].date())] = now
+            for key in [key for key, at in self.flushed_at.items() if now - at > FLUSHED_MEMORY_SECONDS]:
+                del self.flushed_at[key]
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("DELETE FROM punches WHERE id = ?", [(p['id'],) for p in written])
+                for punch, message in failed:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO failed_punches "
+                        "SELECT id, kind, name, day, punched_at, location, photo, queued_at, ?, ? FROM punches WHERE id = ?",
+                        (message, time.time(), punch['id'])
+                    )
+                    self.conn.execute("DELETE FROM punches WHERE id = ?", (punch['id'],))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        for punch in written + [punch for punch, _ in failed]:
+            self.attempts.pop(punch['id'], None)
+
+        self.last_flush_at = time.time()
+        self.last_error = refused[0][1] if refused else None
+        self.flushed += len(written)
+        if written:
+            try:
+                self.follow_ups(written)
+            except Exception as e:
+                # The records are in, a missed rollup refresh is repaired by 'rollups.py rebuild'
+                print(f"Error after flushing punches: {e}")
+        return len(punches)
+
+    def flushed_since(self, name, date, since):
+        # Whether a punch for this employee and day reached MongoDB after time.monotonic() 'since'
+        with self.lock:
+            flushed_at = self.flushed_at.get((name, date))
+        return flushed_at is not None and flushed_at >= since
+
+    def run(self):
+        backoff = FLUSH_INTERVAL_SECONDS
+        while True:
+            try:
+                # Refused punches stay at the head of the queue, they are retried on the next round
+                while self.flush() == FLUSH_BATCH_SIZE and self.last_error is None:
+                    pass
+                backoff = FLUSH_INTERVAL_SECONDS
+            except PyMongoError as e:
+                # MongoDB is slow or away: keep the punches and retry with a growing delay
+                self.last_error = str(e)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            except Exception as e:
+                # Anything else (a full disk, a bad row) must not end the thread either
+                self.last_error = f"{type(e).__name__}: {e}"
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            self.wake.wait(backoff)
+            self.wake.clear()
+
+    def status(self):
+        with self.lock:
+            depth, oldest = self.conn.execute("SELECT COUNT(*), MIN(queued_at) FROM punches").fetchone()
+            failed = self.conn.execute("SELECT COUNT(*) FROM failed_punches").fetchone()[0]
+        return {
+            'Queued': depth,
+            'Failed': failed,
+            'Lag (s)': round(time.time() - oldest, 1) if oldest is not None else 0.0,
+            'Flushed': self.flushed,
+            'Last Flush': datetime.fromtimestamp(self.last_flush_at).strftime('%H:%M:%S') if self.last_flush_at else None,
+            'Last Error': self.last_error
+        }
+
+    def failed_punches(self):
+        # Punches MongoDB kept refusing, for the admin panel (photos left out)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, name, day, punched_at, error, failed_at FROM failed_punches ORDER BY id"
+            ).fetchall()
+        return [
+            {'Kind': kind, 'Name': name, 'Date': day, 'Punched At': punched_at, 'Error': error,
+             'Failed At': datetime.fromtimestamp(failed_at).strftime('%Y-%m-%d %H:%M:%S')}
+            for kind, name, day, punched_at, error, failed_at in rows
+        ]
+
+_punch_queue = None
+_punch_queue_lock = threading.Lock()
+
+def get_punch_queue():
+    # None unless PUNCH_QUEUE_PATH is set; one queue and flush thread per process
+    global _punch_queue
+    if QUEUE_PATH is None:
+        return None
+    with _punch_queue_lock:
+        if _punch_queue is None:
+            _punch_queue = PunchQueue(QUEUE_PATH).start()
+    return _punch_queue
+
+def submit_arrival(name, date, photo, location=None, entry=None):
+    queue = get_punch_queue()
+    if queue is None:
+        return log_arrival(name, date, photo, location)
+    # entry is the employee's record for the day as the page knows it (database or queue)
+    if entry is not None:
+        return False, ARRIVAL_EXISTS
+    queue.enqueue('arrival', name, date, get_current_ist_time(), location, photo.getvalue())
+    return True, ARRIVAL_QUEUED
+
+def submit_leaving(name, date, photo, location=None, entry=None):
+    queue = get_punch_queue()
+    if queue is None:
+        return log_leaving(name, date, photo, location)
+    if entry is None:
+        return False, ARRIVAL_MISSING
+    if entry.get('Leaving Time') is not None:
+        return False, LEAVING_EXISTS
+    queue.enqueue('leaving', name, date, get_current_ist_time(), location, photo.getvalue())
+    return True, LEAVING_QUEUED
+
+def with_pending(today, name, date):
+    # Today's record as the page should show it, including punches still in the queue
+    queue = get_punch_queue()
+    if queue is None:
+        return today.get(name)
+    # The queue is read first: a punch that is no longer in it was flushed, and is remembered
+    pending = queue.pending(name, date)
+    if queue.flushed_since(name, date, today.polled_at):
+        # Flushed after the view last synced, so the record is fetched now instead of at the next poll
+        today.refresh()
+    entry = today.get(name)
+    if not pending:
+        return entry
+    entry = dict(entry) if entry is not None else {'Name': name, 'Arrival Time': None, 'Leaving Time': None}
+    if entry.get('Arrival Time') is None and 'arrival' in pending:
+        entry['Arrival Time'] = pending['arrival']
+    if entry.get('Leaving Time') is None and 'leaving' in pending:
+        entry['Leaving Time'] = pending['leaving']
+    return entry
@@ -0,0 +1,81 @@
+from datetime import datetime
+import pandas as pd
+
+from archive import archive_date_range, read_archive
+from cache import cache
+from db import attendance_collection
+from instrumentation import span, timed
+from photo_store import PHOTO_FIELDS
+
+# Fields fetched for the attendance tables and charts (photos are never needed there)
+RECORD_FIELDS = ['Arrival Time', 'Leaving Time', 'Hours Present']
+
+def to_query_date(value):
+    # Attendance dates are stored as midnight datetimes
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, datetime.min.time())
+
+def build_attendance_query(start_date=None, end_date=None, employee=None, fields=None):
+    query = {}
+    if start_date is not None or end_date is not None:
+        query['Date'] = {}
+        if start_date is not None:
+            query['Date']['$gte'] = to_query_date(start_date)
+        if end_date is not None:
+            query['Date']['$lte'] = to_query_date(end_date)
+
+    if employee is not None and employee != 'All':
+        query['Name'] = employee
+
+    if fields is None:
+        # Never ship the photo blobs unless a caller explicitly asks for them
+        projection = {field: 0 for field in PHOTO_FIELDS}
+    else:
+        projection = {'_id': 0, 'Name': 1, 'Date': 1}
+        projection.update({field: 1 for field in fields})
+    return query, projection
+
+def fetch_attendance(query, projection, columns):
+    entries = list(attendance_collection.find(query, projection))
+    with span('fetch_attendance.frame', 'pandas'):
+        for entry in entries:
+            entry['Date'] = entry['Date'].strftime('%Y-%m-%d')
+        return pd.DataFrame(entries, columns=columns)
+
+def fetch_attendance_tiers(query, projection, columns, start_date, end_date, employee, fields):
+    # The hot collection is always asked: for an archived range its (Date, Name) index answers
+    # at once, and records written into an archived month after the archive job ran are found.
+    df = fetch_attendance(query, projection, columns)
+    archived = read_archive(start_date, end_date, employee, fields)
+    if archived is None:
+        return df
+    with span('fetch_attendance.merge', 'pandas'):
+        archived['Date'] = archived['Date'].dt.strftime('%Y-%m-%d')
+        return pd.concat([archived, df], ignore_index=True)
+
+@timed('load_attendance', 'load')
+def load_attendance(start_date=None, end_date=None, employee=None, fields=None):
+    query, projection = build_attendance_query(start_date, end_date, employee, fields)
+
+    columns = None
+    if fields is not None:
+        columns = ['Name', 'Date'] + [field for field in fields if field not in ('Name', 'Date')]
+
+    # Snapshots are shared by every rerun and session until the next attendance write
+    key = ('load_attendance', repr(query), repr(projection))
+    df = cache.get('attendance', key, lambda: fetch_attendance_tiers(query, projection, columns, start_date, end_date, employee, fields))
+    return df.copy()
+
+def fetch_attendance_date_range():
+    first = attendance_collection.find_one({}, {'_id': 0, 'Date': 1}, sort=[('Date', 1)])
+    last = attendance_collection.find_one({}, {'_id': 0, 'Date': 1}, sort=[('Date', -1)])
+    dates = [first['Date'].date(), last['Date'].date()] if first is not None else []
+    # The Parquet archive (archive.py) holds the older months
+    dates += [day for day in archive_date_range() if day is not None]
+    if not dates:
+        return None, None
+    return min(dates), max(dates)
+
+def get_attendance_date_range():
+    return cache.get('attendance', 'date_range', fetch_attendance_date_range)
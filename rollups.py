@@ -0,0 +1,170 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime
+import pandas as pd
+from pymongo import UpdateOne
+
+from archive import archive_records, iter_archive
+from cache import cache
+from db import attendance_collection, rollups_collection
+from query import RECORD_FIELDS, to_query_date
+from stats import leave_adjusted_stats
+
+# Rollup documents look like
+#   {'Period': 'day' | 'month', 'Name': ..., 'Date': <day or first of month>,
+#    'Days Present': ..., 'Hours': ..., 'Incomplete Days': ...}
+# Day rollups mirror a single attendance record, month rollups sum the days of that month.
+ROLLUP_FIELDS = ['Days Present', 'Hours', 'Incomplete Days']
+SOURCE_PROJECTION = {'_id': 0, 'Name': 1, 'Date': 1, 'Arrival Time': 1, 'Leaving Time': 1, 'Hours Present': 1}
+
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month_start(day):
+    if day.month == 12:
+        return day.replace(year=day.year + 1, month=1, day=1)
+    return day.replace(month=day.month + 1, day=1)
+
+def day_totals(entry):
+    # A day without both punches counts as a leave, same as calculate_attendance_stats
+    incomplete = entry.get('Arrival Time') is None or entry.get('Leaving Time') is None
+    return {
+        'Days Present': 1,
+        'Hours': entry.get('Hours Present') or 0,
+        'Incomplete Days': int(incomplete)
+    }
+
+def refresh_rollups(name, date):
+    day = datetime.combine(date, datetime.min.time())
+    key = {'Period': 'day', 'Name': name, 'Date': day}
+
+    entry = attendance_collection.find_one({'Name': name, 'Date': day}, SOURCE_PROJECTION)
+    if entry is None:
+        rollups_collection.delete_one(key)
+    else:
+        rollups_collection.update_one(key, {'$set': day_totals(entry)}, upsert=True)
+
+    # Re-add the month from its (at most 31) day rollups so repeated refreshes stay idempotent
+    start = month_start(day)
+    totals = list(rollups_collection.aggregate([
+        {'$match': {'Period': 'day', 'Name': name, 'Date': {'$gte': start, '$lt': next_month_start(start)}}},
+        {'$group': {'_id': None, **{field: {'$sum': f'${field}'} for field in ROLLUP_FIELDS}}}
+    ]))
+    month_key = {'Period': 'month', 'Name': name, 'Date': start}
+    if totals:
+        totals[0].pop('_id')
+        rollups_collection.update_one(month_key, {'$set': totals[0]}, upsert=True)
+    else:
+        rollups_collection.delete_one(month_key)
+
+def refresh_rollups_many(keys):
+    # Batched refresh_rollups for many changed records, e.g. after an import: one read of the
+    # attendance records and one month aggregation per affected month, nothing else is touched
+    months = defaultdict(set)
+    for name, day in keys:
+        months[month_start(day)].add(name)
+
+    days = 0
+    for start, names in sorted(months.items()):
+        month_range = {'$gte': start, '$lt': next_month_start(start)}
+        names = sorted(names)
+        entries = attendance_collection.find({'Name': {'$in': names}, 'Date': month_range}, SOURCE_PROJECTION)
+        requests = [
+            UpdateOne({'Period': 'day', 'Name': entry['Name'], 'Date': entry['Date']}, {'$set': day_totals(entry)}, upsert=True)
+            for entry in entries if (entry['Name'], entry['Date']) in keys
+        ]
+        if requests:
+            rollups_collection.bulk_write(requests, ordered=False)
+            days += len(requests)
+
+        # Month totals from the day rollups, which also cover days already moved to the archive
+        totals = rollups_collection.aggregate([
+            {'$match': {'Period': 'day', 'Name': {'$in': names}, 'Date': month_range}},
+            {'$group': {'_id': '$Name', **{field: {'$sum': f'${field}'} for field in ROLLUP_FIELDS}}}
+        ])
+        requests = [
+            UpdateOne({'Period': 'month', 'Name': row.pop('_id'), 'Date': start}, {'$set': row}, upsert=True)
+            for row in totals
+        ]
+        if requests:
+            rollups_collection.bulk_write(requests, ordered=False)
+    return days, len(months)
+
+def source_records(batch_size):
+    # Archived months first, then the hot collection (hot records win over their archived copy)
+    for archived in iter_archive(fields=RECORD_FIELDS):
+        yield from archive_records(archived)
+    yield from attendance_collection.find({}, SOURCE_PROJECTION).batch_size(batch_size)
+
+def rebuild_rollups(batch_size=1000):
+    rollups_collection.delete_many({})
+
+    months = {}
+    batch = []
+    days = 0
+    for entry in source_records(batch_size):
+        totals = day_totals(entry)
+        batch.append({'Period': 'day', 'Name': entry['Name'], 'Date': entry['Date'], **totals})
+
+        month = months.setdefault((entry['Name'], month_start(entry['Date'])), dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field in ROLLUP_FIELDS:
+            month[field] += totals[field]
+
+        if len(batch) >= batch_size:
+            rollups_collection.insert_many(batch, ordered=False)
+            days += len(batch)
+            batch = []
+            print(f"Rolled up {days} days")
+
+    if batch:
+        rollups_collection.insert_many(batch, ordered=False)
+        days += len(batch)
+
+    month_docs = [{'Period': 'month', 'Name': name, 'Date': start, **totals} for (name, start), totals in months.items()]
+    if month_docs:
+        rollups_collection.insert_many(month_docs, ordered=False)
+    return days, len(month_docs)
+
+def load_rollups(period, start_date=None, end_date=None, employee=None):
+    query = {'Period': period}
+    if start_date is not None or end_date is not None:
+        query['Date'] = {}
+        if start_date is not None:
+            query['Date']['$gte'] = to_query_date(start_date)
+        if end_date is not None:
+            query['Date']['$lte'] = to_query_date(end_date)
+    if employee is not None and employee != 'All':
+        query['Name'] = employee
+
+    projection = {'_id': 0, 'Name': 1, 'Date': 1, **{field: 1 for field in ROLLUP_FIELDS}}
+    df = cache.get(
+        'attendance',
+        ('load_rollups', repr(query)),
+        lambda: pd.DataFrame(list(rollups_collection.find(query, projection)), columns=['Name', 'Date'] + ROLLUP_FIELDS)
+    )
+    return df.copy()
+
+def rollup_attendance_stats(employee='All', directory=None):
+    # Same table as calculate_attendance_stats, built from one row per employee per month
+    monthly = load_rollups('month', employee=employee)
+    totals = monthly.groupby('Name', sort=False)[ROLLUP_FIELDS].sum()
+    if directory is not None and employee == 'All':
+        # Directory employees without any records still get a (zero) row
+        totals = totals.reindex(totals.index.union(pd.Index(directory, name='Name'), sort=False), fill_value=0)
+    return leave_adjusted_stats(totals)
+
+def main():
+    parser = argparse.ArgumentParser(description='Attendance rollup maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='Recompute every rollup from the attendance records')
+    rebuild_parser.add_argument('--batch-size', type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == 'rebuild':
+        days, months = rebuild_rollups(args.batch_size)
+        cache.invalidate('attendance')
+        print(f"Done, {days} day and {months} month rollups written.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+def month_keys(dates):
+    # Integer-backed monthly period keys, no per-row string formatting
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[M]')
+
+def month_key(month):
+    # month is a label like 'January 2024', as shown in the month pickers
+    return np.datetime64(datetime.strptime(month, '%B %Y'), 'M')
+
+def attendance_totals(df):
+    # Days, hours and incomplete days per employee in a single pass over the rows
+    codes, names = pd.factorize(df['Name'], sort=False)
+    keep = codes >= 0
+    codes = codes[keep]
+    size = len(names)
+
+    hours = pd.to_numeric(df['Hours Present'], errors='coerce').to_numpy(dtype=float)[keep]
+    incomplete = (df['Arrival Time'].isna() | df['Leaving Time'].isna()).to_numpy()[keep]
+
+    return pd.DataFrame({
+        'Days Present': np.bincount(codes, minlength=size),
+        'Hours': np.bincount(codes, weights=np.nan_to_num(hours), minlength=size),
+        'Incomplete Days': np.bincount(codes, weights=incomplete, minlength=size).astype(np.int64)
+    }, index=pd.Index(names, name='Name'))
+
+def leave_adjusted_stats(totals):
+    # One incomplete day (leave) is allowed, every further one is taken off the days present
+    extra_leaves = (totals['Incomplete Days'] - 1).clip(lower=0)
+    return pd.DataFrame({
+        'Name': totals.index.to_numpy(),
+        'Total Days Present': (totals['Days Present'] - extra_leaves).to_numpy(),
+        'Total Hours': totals['Hours'].round(2).to_numpy(),
+        'Leaves Taken': totals['Incomplete Days'].to_numpy()
+    })
+
+@timed('calculate_attendance_stats', 'pandas')
+def calculate_attendance_stats(df, employee, month):
+    mask = np.ones(len(df), dtype=bool)
+    if month != 'All':
+        mask &= month_keys(df['Date']) == month_key(month)
+
+    if employee != 'All':
+        mask &= (df['Name'] == employee).to_numpy()
+
+    if not mask.all():
+        df = df[mask]
+    return leave_adjusted_stats(attendance_totals(df))
+
+def days_present(names, dates):
+    # Distinct dates per employee, broadcast back onto every row
+    codes, uniques = pd.factorize(names, sort=False)
+    pairs = pd.DataFrame({'code': codes, 'date': dates}).dropna().drop_duplicates()
+    pairs = pairs[pairs['code'] >= 0]
+    counts = np.bincount(pairs['code'].to_numpy(), minlength=len(uniques))
+    return np.where(codes >= 0, counts[codes], 0)
+
+@timed('view_attendance', 'pandas')
+def view_attendance(df, start_date, end_date, employee, attributes):
+    dates = pd.to_datetime(df['Date'])
+    mask = (dates >= start_date) & (dates <= end_date)
+
+    if employee != 'All':
+        mask &= df['Name'] == employee
+
+    columns = [attribute for attribute in attributes if attribute != 'Days Present']
+    result = df.loc[mask, ['Name'] + columns]
+    result.insert(1, 'Date', dates[mask])
+
+    # Calculate 'Days Present' if selected
+    if 'Days Present' in attributes:
+        result['Days Present'] = days_present(result['Name'].to_numpy(), result['Date'].to_numpy())
+
+    return result[['Name', 'Date'] + attributes]
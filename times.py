@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import pytz
+
+# Define IST timezone
+IST = pytz.timezone('Asia/Kolkata')
+
+TIME_FORMAT = '%I:%M %p'
+TIME_FIELDS = ['Arrival Time', 'Leaving Time']
+
+# Punch times are stored as BSON dates (UTC). Records written before the migration
+# hold '%I:%M %p' strings instead, so everything here accepts both.
+
+def to_ist(value):
+    if value is None or isinstance(value, str) or pd.isna(value):
+        return None
+    # pymongo hands back naive datetimes that are in UTC
+    if value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return value.astimezone(IST)
+
+def format_time(value):
+    if isinstance(value, str):
+        return value
+    value = to_ist(value)
+    return value.strftime(TIME_FORMAT) if value is not None else None
+
+def clock_time(value):
+    # Time of day in IST, used for the arrival/leaving charts
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, TIME_FORMAT).time()
+        except ValueError:
+            return None
+    value = to_ist(value)
+    return value.time() if value is not None else None
+
+def parse_clock_time(text, day, after=None):
+    # '09:30 AM' on a given (IST) calendar day; a time before `after` is taken to be on the next day
+    clock = datetime.strptime(text.strip(), TIME_FORMAT).time()
+    value = IST.localize(datetime.combine(day, clock))
+    if after is not None and value < after:
+        value = IST.localize(datetime.combine(day + timedelta(days=1), clock))
+    return value
+
+def ist_series(values):
+    # Vectorised conversion for migrated columns; legacy strings fall back to a per-value path
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is None:
+            values = values.dt.tz_localize('UTC')
+        return values.dt.tz_convert(IST)
+    return None
+
+def format_time_columns(df, columns=TIME_FIELDS):
+    df = df.copy()
+    for column in columns:
+        if column not in df:
+            continue
+        converted = ist_series(df[column])
+        if converted is not None:
+            df[column] = converted.dt.strftime(TIME_FORMAT)
+        else:
+            df[column] = df[column].map(format_time)
+    return df
+
+def clock_time_series(values):
+    converted = ist_series(values)
+    if converted is not None:
+        return converted.dt.time
+    return values.map(clock_time)
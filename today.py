@@ -0,0 +1,54 @@
+import time
+from datetime import datetime
+
+from db import attendance_collection
+
+TODAY_COLUMNS = ['Name', 'Date', 'Arrival Time', 'Leaving Time', 'Hours Present']
+TODAY_PROJECTION = {'_id': 0, 'Name': 1, 'Arrival Time': 1, 'Leaving Time': 1, 'Hours Present': 1, 'Updated At': 1}
+
+# How often a kiosk picks up punches made on other kiosks
+POLL_SECONDS = 15
+
+class TodayAttendance:
+    # Who has arrived and left on one day. Loaded once with a date-filtered query, then
+    # kept current with deltas: only records whose 'Updated At' moved since the last sync.
+    def __init__(self, day):
+        self.day = datetime.combine(day, datetime.min.time())
+        self.records = {}
+        self.synced_at = None
+        self.polled_at = 0.0
+        self.refresh(full=True)
+
+    def is_for(self, day):
+        return self.day.date() == day
+
+    def apply(self, entries):
+        for entry in entries:
+            self.records[entry['Name']] = entry
+            updated_at = entry.get('Updated At')
+            if updated_at is not None and (self.synced_at is None or updated_at > self.synced_at):
+                self.synced_at = updated_at
+
+    def refresh(self, full=False):
+        # Taken before the query, so a write that lands while it runs counts as after the sync
+        started = time.monotonic()
+        query = {'Date': self.day}
+        if not full and self.synced_at is not None:
+            # $gte so a write landing in the same millisecond is not missed, applying twice is harmless
+            query['Updated At'] = {'$gte': self.synced_at}
+        self.apply(attendance_collection.find(query, TODAY_PROJECTION))
+        self.polled_at = started
+
+    def poll(self):
+        if time.monotonic() - self.polled_at >= POLL_SECONDS:
+            self.refresh()
+
+    def get(self, name):
+        return self.records.get(name)
+
+    def rows(self):
+        date_label = self.day.strftime('%Y-%m-%d')
+        return [
+            {'Name': entry['Name'], 'Date': date_label, **{column: entry.get(column) for column in TODAY_COLUMNS[2:]}}
+            for entry in self.records.values()
+        ]